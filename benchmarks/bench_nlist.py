@@ -0,0 +1,231 @@
+"""Benchmarks for the hot paths of :class:`nlist.NList`.
+
+Usage:
+::
+
+    python benchmarks/bench_nlist.py
+    python benchmarks/bench_nlist.py --max-size 1000000 --save baseline.json
+    python benchmarks/bench_nlist.py --compare baseline.json --threshold 0.2
+
+Every benchmark is run for sizes from 10^2 up to `--max-size` (10^7 at
+most), reporting the best time per call and the peak memory allocated
+during one call, as measured by :mod:`tracemalloc`. With `--compare`,
+benchmarks that got slower than the baseline by more than `--threshold`
+are reported, and the exit status is 1 if there are any.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nlist import NList
+
+
+SIZES = [10 ** k for k in range(2, 8)]
+# Number of scalar accesses per call in the get/set benchmarks
+ACCESSES = 1000
+
+
+def square_shape(size, rank):
+    """Returns a shape of `rank` equal dimensions with about `size` elements."""
+    dim = max(1, round(size ** (1 / rank)))
+    return (dim,) * rank
+
+
+def spread_keys(l, count):
+    """Returns `count` valid indexes of `l` spread over the whole NList."""
+    step = max(1, l.size // count)
+    keys = [l._unravel(position) for position in range(0, l.size, step)]
+    return (keys * (count // len(keys) + 1))[:count]
+
+
+def bench_init_shape(size):
+    return lambda: NList(shape=(size,), default=0)
+
+def bench_init_nested(size):
+    nested = NList(shape=square_shape(size, 2), default=0).to_nested()
+    return lambda: NList(nested)
+
+def bench_init_nlist(size):
+    l = NList(shape=square_shape(size, 2), default=0)
+    return lambda: NList(l)
+
+def bench_get(rank):
+    def bench(size):
+        l = NList(shape=square_shape(size, rank) if rank else (), default=0)
+        keys = spread_keys(l, ACCESSES)
+
+        def run():
+            for key in keys:
+                l[key]
+        return run
+    return bench
+
+def bench_set(rank):
+    def bench(size):
+        l = NList(shape=square_shape(size, rank) if rank else (), default=0)
+        keys = spread_keys(l, ACCESSES)
+
+        def run():
+            for key in keys:
+                l[key] = 1
+        return run
+    return bench
+
+def bench_keys(size):
+    l = NList(shape=square_shape(size, 2), default=0)
+    return lambda: sum(1 for _ in l.keys())
+
+def bench_enumerate(size):
+    l = NList(shape=square_shape(size, 2), default=0)
+    return lambda: sum(1 for _ in l.enumerate())
+
+def bench_index(size):
+    l = NList(shape=square_shape(size, 2), default=0)
+    l[tuple(x - 1 for x in l.shape)] = 1
+    return lambda: l.index(1)
+
+def bench_count(size):
+    l = NList(shape=square_shape(size, 2), default=0)
+    return lambda: l.count(0)
+
+def bench_copy(size):
+    l = NList(shape=square_shape(size, 2), default=0)
+    return l.copy
+
+def bench_eq(size):
+    l = NList(shape=square_shape(size, 2), default=0)
+    l2 = l.copy()
+    return lambda: l == l2
+
+def bench_repr(size):
+    l = NList(shape=square_shape(size, 2), default=0)
+    return lambda: repr(l)
+
+def bench_convolve(size):
+    l = NList(shape=square_shape(size, 2), default=1)
+    kernel = NList(shape=(3, 3), default=1)
+    return lambda: l.convolve(kernel)
+
+
+# Pairs of (name, setup function, whether the benchmark depends on size)
+BENCHMARKS = [
+    ('init_shape', bench_init_shape, True),
+    ('init_nested', bench_init_nested, True),
+    ('init_nlist', bench_init_nlist, True),
+    ('get_rank0', bench_get(0), False),
+    ('set_rank0', bench_set(0), False),
+] + [
+    (name % rank, bench(rank), True)
+    for rank in range(1, 5)
+    for name, bench in [('get_rank%s', bench_get), ('set_rank%s', bench_set)]
+] + [
+    ('keys', bench_keys, True),
+    ('enumerate', bench_enumerate, True),
+    ('index', bench_index, True),
+    ('count', bench_count, True),
+    ('copy', bench_copy, True),
+    ('eq', bench_eq, True),
+    ('repr', bench_repr, True),
+    ('convolve', bench_convolve, True),
+]
+
+
+def autorange(timer):
+    """Returns a number of calls that takes at least 0.2 seconds, like
+    timeit.Timer.autorange() which is missing before Python 3.6.
+    """
+    number = 1
+    while True:
+        for multiplier in (1, 2, 5):
+            if timer.timeit(number * multiplier) >= 0.2:
+                return number * multiplier
+        number *= 10
+
+def measure_time(func, repeat):
+    timer = timeit.Timer(func)
+    number = autorange(timer)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def measure_memory(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run(names, sizes, repeat):
+    results = {}
+    for name, setup, sized in BENCHMARKS:
+        if names and name not in names:
+            continue
+        for size in sizes if sized else sizes[:1]:
+            func = setup(size)
+            key = '%s@%s' % (name, size) if sized else name
+            results[key] = {
+                'seconds': measure_time(func, repeat),
+                'peak_bytes': measure_memory(func),
+            }
+            print('%-24s %12.3f us %14d B' % (
+                key, results[key]['seconds'] * 1e6, results[key]['peak_bytes']
+            ))
+            sys.stdout.flush()
+    return results
+
+def compare(results, baseline, threshold):
+    """Prints benchmarks slower than in `baseline` by more than `threshold`
+    and returns their number.
+    """
+    regressions = 0
+    for key, result in sorted(results.items()):
+        if key not in baseline:
+            continue
+        ratio = result['seconds'] / baseline[key]['seconds']
+        if ratio > 1 + threshold:
+            regressions += 1
+            print('REGRESSION %-24s %.2fx slower (%.3f us -> %.3f us)' % (
+                key, ratio,
+                baseline[key]['seconds'] * 1e6, result['seconds'] * 1e6,
+            ))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark NList hot paths.')
+    parser.add_argument('--max-size', type=int, default=10 ** 5,
+                        help='largest size to benchmark, up to 10^7')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of timing repetitions, the best is kept')
+    parser.add_argument('--only', nargs='*', metavar='NAME', default=[],
+                        help='run only the named benchmarks')
+    parser.add_argument('--save', metavar='PATH',
+                        help='write the results to a JSON baseline file')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare the results with a JSON baseline file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    sizes = [size for size in SIZES if size <= args.max_size] or SIZES[:1]
+    results = run(set(args.only), sizes, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
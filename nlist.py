@@ -1,4 +1,4 @@
-__all__ = ['NList']
+__all__ = ['NList', 'FrozenNList', 'LazyNList']
 __doc__ = """This module provides class :class:`NList`, a multidimensional list.
 
 Indexes and shapes used with NList must be tuples.
@@ -11,36 +11,638 @@ Example:
 NList's shape can be an empty tuple meaning a zero-dimensional list that has
 one element with index ().
 
+NList can store its elements in a compact typed buffer instead of a Python list
+by passing `dtype`, one of the :mod:`array` module's typecodes.
+Example:
+::
+
+    l = nlist.NList(shape=(4000, 4000), dtype='d')
+
+A typed NList only accepts values representable by its typecode, and its
+default value is 0.
+
+An NList with mostly equal elements can be made sparse, storing only the
+elements that differ from `default`, so that even huge NLists are cheap
+to create:
+::
+
+    l = nlist.NList(shape=(100000, 100000), sparse=True)
+    l[5, 7] = 'x'
+    list(l.nonzero_items())  # [((5, 7), 'x')]
+
+A typed NList can also live in a file, see :meth:`NList.open_mmap`.
+Typed NLists expose their elements through :meth:`NList.as_memoryview` and
+the NumPy array interface, so they can be converted to and from NumPy arrays
+without copying (see :meth:`NList.to_numpy` and :meth:`NList.from_buffer`).
+On Python 3.12 and later, they also support the buffer protocol directly,
+e.g. ``memoryview(l)``.
+Any NList can be written to a file with :meth:`NList.save` and read back with
+:meth:`NList.load`.
+
+Elements can also be stored in tiles of a fixed shape, which are only
+allocated when written to, see the `chunks` argument and :meth:`NList.iter_chunks`:
+::
+
+    l = nlist.NList(shape=(10000, 10000), default=0, chunks=(64, 64))
+
 NList converts to False only if its :attr:`size` is 0, meaning that
 at least one of its dimensions is 0. Note that the :attr:`size` of a
 zero-dimensional NList is 1.
 
 An NList equals another NList if their shapes and all their elements are equal.
 
+Views with a different layout are returned by :meth:`NList.reshape`,
+:meth:`NList.transpose` and :meth:`NList.swapaxes`.
+
+Dimensions can grow in amortised linear time with :meth:`NList.append`,
+:meth:`NList.extend` and :meth:`NList.resize`:
+::
+
+    series = nlist.NList(shape=(0, 3))
+    series.append([1, 2, 3])  # series.shape is now (1, 3)
+
+Arithmetic operators (``+``, ``-``, ``*``, ``/``, ``//``, ``%``, ``**``) and
+ordering comparisons (``<``, ``<=``, ``>``, ``>=``) work elementwise and
+return a new NList, broadcasting shapes as :meth:`NList.map` does.
+Example:
+::
+
+    a = nlist.NList([[1, 2, 3], [4, 5, 6]])
+    a * 2 + nlist.NList([10, 20, 30])  # NList([[12, 24, 36], [18, 30, 42]])
+
+Chains of elementwise operations can be evaluated lazily in a single pass with
+:meth:`NList.lazy`, see :class:`LazyNList`.
+
+An index tuple may contain slices in place of some of the integers, in which
+case a view is returned: an NList that shares storage with the original one.
+Dimensions indexed with an integer are dropped from the view's shape.
+Example:
+::
+
+    l = nlist.NList(shape=(4, 6))
+    row = l[1, :]
+    block = l[1:3, ::2]
+    block[0, 0] = 42  # l[1, 0] is now 42 too
+
 NList is an iterable of all its elements.
 
+Copies of sparse and chunked NLists share storage until written to, which
+makes :meth:`NList.snapshot` and :meth:`NList.restore` cheap enough for
+undo stacks:
+::
+
+    l = nlist.NList(shape=(1000, 1000), default=0, chunks=(32, 32))
+    history = [l.snapshot()]
+    l[5, 7] = 1  # copies only the tile holding (5, 7)
+    l.restore(history.pop())
+
+:meth:`NList.freeze` returns a :class:`FrozenNList`, an immutable NList that
+can be used as a dict key.
+
+Stencil computations over the neighbours of every element are done by
+:meth:`NList.neighbourhoods` and :meth:`NList.convolve`.
+
+Usage of NLists can be profiled with :meth:`NList.profile`.
+
 Whenever an ordering of indexes is implied,
 standard tuple comparison semantics are used.
 """
 
+import array
+import asyncio
+import json
+import mmap
 import operator
 import itertools
-from itertools import islice
+import os
+import pickle
+import struct
+import sys
+import time
+import weakref
+from itertools import islice, repeat
+from collections import deque, namedtuple
 from collections.abc import Container, Iterable, Sequence
-from functools import reduce
+from contextlib import contextmanager
+from functools import reduce, wraps
 
 
 def product(l):
     return reduce(operator.mul, l, 1)
 
-def group_every_n(l, n):
-    rest = l
+def contiguous_strides(shape):
+    return tuple(
+        product(shape[j] for j in range(k + 1, len(shape)))
+        for k in range(len(shape))
+    )
+
+def is_nested(x):
+    if type(x) is list or type(x) is tuple:
+        return True
+    return isinstance(x, Sequence) and not isinstance(x, (str, bytes, bytearray))
+
+def has_slices(key):
+    return isinstance(key, tuple) and any(isinstance(x, slice) for x in key)
+
+missing = object()
+
+# Typecodes that memoryview.cast() supports
+MEMORYVIEW_TYPECODES = 'bBhHiIlLqQfd'
+
+FILE_MAGIC = b'\x93NLIST'
+FILE_VERSION = 1
+
+def open_file(path_or_file, mode):
+    if hasattr(path_or_file, 'read') or hasattr(path_or_file, 'write'):
+        return path_or_file, False
+    return open(path_or_file, mode), True
+
+def unpickle_nlist(cls, data, shape, dtype):
+    if dtype is not None and not isinstance(data, array.array):
+        # Copy pickle buffers into an array, so that the storage stays an
+        # array whether the buffer was passed in-band or out-of-band
+        buffer, data = data, array.array(dtype)
+        data.frombytes(memoryview(buffer).cast('B'))
+    return cls._from_flat(data, shape, dtype)
+
+SharedBlock = namedtuple('SharedBlock', 'name dtype start stop')
+
+def map_values(func, values):
+    return list(map(func, values))
+
+def process_block(operation, func, block):
+    """Applies `operation` to `func` and the values of `block` in a worker
+    process. `block` is either a sequence of values or a :class:`SharedBlock`
+    describing a slice of a shared memory segment.
+    """
+    if not isinstance(block, SharedBlock):
+        return operation(func, block)
+
+    from multiprocessing import shared_memory
+    memory = shared_memory.SharedMemory(name=block.name)
+    try:
+        values = memory.buf.cast(block.dtype)[block.start:block.stop]
+        try:
+            return operation(func, values)
+        finally:
+            values.release()
+    finally:
+        memory.close()
+
+PROFILED_METHODS = ('__getitem__', '__setitem__', 'keys', 'index', 'to_nested')
+# Profiled methods returning lazy iterators, whose consumption is timed too
+ITERATOR_METHODS = ('keys',)
+
+def timed_iteration(iterable, counter):
+    """Yields the items of `iterable`, adding the time spent producing them
+    to `counter`.
+    """
+    iterator = iter(iterable)
     while True:
-        rest1, rest2 = itertools.tee(rest)
-        group, rest = list(islice(rest1, n)), islice(rest2, n, None)
-        if not group:
-            break
-        yield group
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            counter[1] += time.perf_counter() - start
+        yield item
+
+def profiled(func, counter, heatmap, iterates=False):
+    """Wraps an NList method to add its calls and time spent in them to
+    `counter`, and to record element accesses if `heatmap` is set.
+    If `iterates` is set, the time spent iterating over the result is
+    added as well.
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            if iterates:
+                return timed_iteration(func(self, *args, **kwargs), counter)
+            return func(self, *args, **kwargs)
+        finally:
+            counter[0] += 1
+            counter[1] += time.perf_counter() - start
+            if heatmap and args:
+                self._record_access(args[0], heatmap)
+    return wrapper
+
+def array_typestr(dtype):
+    """Returns the NumPy array interface type string of an array typecode."""
+    if dtype in ('u', 'w'):
+        raise TypeError('Typecode %r has no array interface equivalent' % dtype)
+    itemsize = array.array(dtype).itemsize
+    if itemsize == 1:
+        byteorder = '|'
+    else:
+        byteorder = '<' if sys.byteorder == 'little' else '>'
+    kind = 'f' if dtype in 'fd' else 'u' if dtype.isupper() else 'i'
+    return '%s%s%s' % (byteorder, kind, itemsize)
+
+def broadcast_shapes(*shapes):
+    rank = max(map(len, shapes))
+    result = []
+    for axis in range(rank):
+        dims = {
+            shape[axis - rank + len(shape)] for shape in shapes
+            if axis - rank + len(shape) >= 0
+        }
+        dims.discard(1)
+        if len(dims) > 1:
+            raise ValueError(
+                'Shapes %s cannot be broadcast together'
+                % ', '.join(map(str, shapes))
+            )
+        result.append(dims.pop() if dims else 1)
+    return tuple(result)
+
+def elementwise(op):
+    def method(self, other):
+        return self.map(op, other)
+    return method
+
+def reflected(op):
+    def method(self, other):
+        return self.map(lambda x, y: op(y, x), other)
+    return method
+
+def flat_index_0(l, index):
+    if type(index) is tuple and not index:
+        return l._offset
+    return flat_index_n(l, index)
+
+def flat_index_1(l, index):
+    if type(index) is tuple and len(index) == 1:
+        i, = index
+        if type(i) is int and 0 <= i < l._shape[0]:
+            return l._offset + i * l._strides[0]
+    return flat_index_n(l, index)
+
+def flat_index_2(l, index):
+    if type(index) is tuple and len(index) == 2:
+        i, j = index
+        n, m = l._shape
+        if type(i) is int and type(j) is int and 0 <= i < n and 0 <= j < m:
+            s, t = l._strides
+            return l._offset + i * s + j * t
+    return flat_index_n(l, index)
+
+def flat_index_3(l, index):
+    if type(index) is tuple and len(index) == 3:
+        i, j, k = index
+        n, m, p = l._shape
+        if (type(i) is int and type(j) is int and type(k) is int and
+                0 <= i < n and 0 <= j < m and 0 <= k < p):
+            s, t, u = l._strides
+            return l._offset + i * s + j * t + k * u
+    return flat_index_n(l, index)
+
+def flat_index_n(l, index):
+    l._check_index(index)
+    return unchecked_flat_index_n(l, index)
+
+def unchecked_flat_index_0(l, index):
+    return l._offset
+
+def unchecked_flat_index_1(l, index):
+    return l._offset + index[0] * l._strides[0]
+
+def unchecked_flat_index_2(l, index):
+    i, j = index
+    s, t = l._strides
+    return l._offset + i * s + j * t
+
+def unchecked_flat_index_3(l, index):
+    i, j, k = index
+    s, t, u = l._strides
+    return l._offset + i * s + j * t + k * u
+
+def unchecked_flat_index_n(l, index):
+    return l._offset + sum(map(operator.mul, l._strides, index))
+
+FLAT_INDEX_BY_RANK = (flat_index_0, flat_index_1, flat_index_2, flat_index_3)
+UNCHECKED_FLAT_INDEX_BY_RANK = (
+    unchecked_flat_index_0, unchecked_flat_index_1,
+    unchecked_flat_index_2, unchecked_flat_index_3,
+)
+
+class ValueIndexedList(list):
+    """A list that keeps track of the positions of every value it holds."""
+    def __init__(self, values=()):
+        super().__init__(values)
+        self._rebuild_positions()
+
+    def _rebuild_positions(self):
+        self._positions = {}
+        for position, value in enumerate(self):
+            self._positions.setdefault(value, set()).add(position)
+
+    def _discard(self, position):
+        value = list.__getitem__(self, position)
+        positions = self._positions[value]
+        positions.discard(position)
+        if not positions:
+            del self._positions[value]
+
+    def positions(self, value):
+        try:
+            return self._positions.get(value, ())
+        except TypeError:
+            # Unhashable values are not indexed but may equal stored ones
+            return [x for x, y in enumerate(self) if y == value]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            positions, values = range(len(self))[key], list(value)
+            # Fail on unhashable values before changing anything
+            for value in values:
+                hash(value)
+            if len(positions) != len(values):
+                super().__setitem__(key, values)
+                self._rebuild_positions()
+                return
+            for position, value in zip(positions, values):
+                self[position] = value
+            return
+        key = range(len(self))[key]
+        hash(value)
+        self._discard(key)
+        super().__setitem__(key, value)
+        self._positions.setdefault(value, set()).add(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._rebuild_positions()
+
+    def append(self, value):
+        self._positions.setdefault(value, set()).add(len(self))
+        super().append(value)
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def __contains__(self, value):
+        return bool(self.positions(value))
+
+    def count(self, value):
+        return len(self.positions(value))
+
+    def index(self, value, start=0, stop=None):
+        positions = self.positions(value)
+        if stop is None:
+            stop = len(self)
+        if start > 0 or stop < len(self):
+            positions = [x for x in positions if start <= x < stop]
+        if not positions:
+            raise ValueError('%s is not in list' % (value,))
+        return min(positions)
+
+
+class SparseStorage:
+    """A fixed-length sequence that only stores elements different from
+    its default value, keyed by position.
+    """
+    def __init__(self, length, default=None):
+        self._length = length
+        self.default = default
+        self._items = {}
+        # Set when _items is shared with a copy and must be copied before writing
+        self._shared = False
+
+    @classmethod
+    def from_values(cls, values, default=None):
+        storage = cls(0, default)
+        for position, value in enumerate(values):
+            if value != default:
+                storage._items[position] = value
+            storage._length = position + 1
+        return storage
+
+    def copy(self):
+        storage = type(self)(self._length, self.default)
+        storage.share(self)
+        return storage
+
+    def can_share(self, other):
+        return (
+            isinstance(other, SparseStorage) and
+            self._length == other._length and self.default == other.default
+        )
+
+    def share(self, other):
+        """Makes the storage hold the elements of `other`, sharing them until
+        either storage is written to.
+        """
+        self._items = other._items
+        self._shared = other._shared = True
+
+    def stored_items(self):
+        """Returns pairs (position, value) of stored elements by position."""
+        return sorted(self._items.items(), key=operator.itemgetter(0))
+
+    def positions(self, value):
+        if value == self.default:
+            return (x for x in range(self._length) if x not in self._items)
+        return (x for x, y in self._items.items() if y == value)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            positions = range(self._length)[key]
+            return list(map(self._items.get, positions, repeat(self.default)))
+        return self._items.get(key, self.default)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            positions, values = range(self._length)[key], list(value)
+            if len(positions) != len(values):
+                raise ValueError('SparseStorage cannot change its length')
+            for position, value in zip(positions, values):
+                self[position] = value
+            return
+        if self._shared:
+            self._items = self._items.copy()
+            self._shared = False
+        if value == self.default:
+            self._items.pop(key, None)
+        else:
+            self._items[key] = value
+
+    def __iter__(self):
+        return map(self._items.get, range(self._length), repeat(self.default))
+
+    def __eq__(self, other):
+        if isinstance(other, SparseStorage) and self.default == other.default:
+            return self._length == other._length and self._items == other._items
+        return list(self) == list(other)
+
+    def __contains__(self, value):
+        if value == self.default:
+            return len(self._items) < self._length
+        return any(x == value for x in self._items.values())
+
+    def count(self, value):
+        if value == self.default:
+            return self._length - len(self._items)
+        return sum(1 for x in self._items.values() if x == value)
+
+    def index(self, value, start=0, stop=None):
+        stop = self._length if stop is None else min(stop, self._length)
+        if value == self.default:
+            for position in range(start, stop):
+                if position not in self._items:
+                    return position
+        else:
+            found = [x for x in self.positions(value) if start <= x < stop]
+            if found:
+                return min(found)
+        raise ValueError('%s is not in storage' % (value,))
+
+
+class ChunkedStorage:
+    """A sequence of the elements of a multidimensional array, stored in
+    tiles that are allocated on first write. Positions of the elements are
+    their positions in the array's iteration order.
+    """
+    def __init__(self, shape, chunks, default=None, dtype=None):
+        chunks = tuple(chunks)
+        if len(chunks) != len(shape):
+            raise ValueError('Chunks must be rank %s' % len(shape))
+        if any(not isinstance(x, int) or x <= 0 for x in chunks):
+            raise ValueError('Chunk dimensions must be positive integers')
+        if dtype is not None:
+            # Fails on defaults that the tiles could not store
+            default = array.array(dtype, [0 if default is None else default])[0]
+
+        self.shape = tuple(shape)
+        self.chunks = chunks
+        self.default = default
+        self.dtype = dtype
+        self._length = product(shape)
+        self._strides = contiguous_strides(shape)
+        self._chunk_strides = contiguous_strides(chunks)
+        self._chunk_size = product(chunks)
+        self._chunks = {}
+        # Keys of the tiles that are not shared with a copy and can be
+        # written in place, or None if the whole _chunks dict is shared
+        self._owned = set()
+
+    @classmethod
+    def from_values(cls, values, shape, chunks, default=None, dtype=None):
+        storage = cls(shape, chunks, default, dtype)
+        for position, value in enumerate(values):
+            if value != storage.default:
+                storage[position] = value
+        return storage
+
+    def copy(self):
+        storage = type(self)(self.shape, self.chunks, self.default, self.dtype)
+        storage.share(self)
+        return storage
+
+    def can_share(self, other):
+        return (
+            isinstance(other, ChunkedStorage) and
+            (self.shape, self.chunks, self.default, self.dtype) ==
+            (other.shape, other.chunks, other.default, other.dtype)
+        )
+
+    def share(self, other):
+        """Makes the storage hold the tiles of `other`, sharing them until
+        they are written to. Only the tiles written to are then copied.
+        """
+        self._chunks = other._chunks
+        self._owned = other._owned = None
+
+    def is_allocated(self, index):
+        """Checks if the tile containing `index` has been written to."""
+        return tuple(map(operator.floordiv, index, self.chunks)) in self._chunks
+
+    def _locate(self, position):
+        """Returns the key of the tile holding `position` and the position
+        within the tile.
+        """
+        key, inner = [], 0
+        for stride, chunk, chunk_stride in zip(
+                self._strides, self.chunks, self._chunk_strides):
+            x, position = divmod(position, stride)
+            tile, x = divmod(x, chunk)
+            key.append(tile)
+            inner += x * chunk_stride
+        return tuple(key), inner
+
+    def _allocate(self, key):
+        if self.dtype is None:
+            chunk = [self.default] * self._chunk_size
+        else:
+            chunk = array.array(self.dtype, [self.default]) * self._chunk_size
+        self._chunks[key] = chunk
+        self._owned.add(key)
+        return chunk
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[position] for position in range(self._length)[key]]
+        key, inner = self._locate(key)
+        chunk = self._chunks.get(key)
+        return self.default if chunk is None else chunk[inner]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            positions, values = range(self._length)[key], list(value)
+            if len(positions) != len(values):
+                raise ValueError('ChunkedStorage cannot change its length')
+            for position, value in zip(positions, values):
+                self[position] = value
+            return
+        key, inner = self._locate(key)
+        if self._owned is None:
+            self._chunks = self._chunks.copy()
+            self._owned = set()
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = self._allocate(key)
+        elif key not in self._owned:
+            chunk = self._chunks[key] = chunk[:]
+            self._owned.add(key)
+        chunk[inner] = value
+
+    def __iter__(self):
+        return map(self.__getitem__, range(self._length))
+
+    def __eq__(self, other):
+        return len(self) == len(other) and list(self) == list(other)
+
+    def __contains__(self, value):
+        return self.count(value) > 0
+
+    def count(self, value):
+        # Padding of the tiles at the edges always holds the default value
+        if value == self.default:
+            stored = sum(
+                self._chunk_size - chunk.count(value)
+                for chunk in self._chunks.values()
+            )
+            return self._length - stored
+        return sum(chunk.count(value) for chunk in self._chunks.values())
+
+    def index(self, value, start=0, stop=None):
+        stop = self._length if stop is None else min(stop, self._length)
+        for position in range(start, stop):
+            if self[position] == value:
+                return position
+        raise ValueError('%s is not in storage' % (value,))
 
 
 class NList:
@@ -49,162 +651,1289 @@ class NList:
 
     :param other: Either an another NList or a nested sequence to copy data from.
         For instance, if other is [[1, 2, 3], [4, 5, 6]], a 2x3 NList will be
-        created with this data.
+        created with this data. Nested strings and bytes are treated as
+        elements, not as sequences.
     :param tuple shape: A tuple of dimension sizes. E.g. (2, 3) for 2x3 NList.
     :param default: A value to fill the NList with when `shape` is passed.
+    :param str dtype: An :mod:`array` typecode, e.g. 'd' or 'i', to store
+        the elements in a typed array instead of a list. When copying from
+        another NList, its dtype is used by default.
+    :param bool sparse: Store only the elements that differ from `default`.
+    :param tuple chunks: Store the elements in tiles of this shape, allocating
+        each tile on the first write to it.
 
-    `other` and `shape`/`default` arguments are mutually exclusive
+    `other` and `shape`/`default` arguments are mutually exclusive, except
+    that `default` may be passed along with `other` for sparse or chunked
+    NLists. `sparse` is mutually exclusive with `dtype` and `chunks`.
     """
-    def __init__(self, other=None, shape=None, default=None):
+
+    #: NLists with more elements than this are summarised by :func:`repr`,
+    #: showing only the first and last :attr:`repr_edgeitems` entries of
+    #: each long dimension.
+    repr_threshold = 1000
+    #: Number of entries kept at each end of a summarised dimension.
+    repr_edgeitems = 3
+
+    # Maps names of profiled methods to [calls, seconds]
+    _profile_counters = {}
+    # Maps ids of NLists to (weak reference, heatmap shape, {region: count})
+    _heatmaps = {}
+    _profiling = False
+
+    # Set on views, which share the storage of another NList
+    _is_view = False
+
+    def __init__(self, other=None, shape=None, default=None, dtype=None,
+                 sparse=False, chunks=None):
+        if dtype is not None and dtype not in array.typecodes:
+            raise ValueError('Unsupported dtype %r' % (dtype,))
+        if dtype is not None and sparse:
+            raise ValueError("'dtype' and 'sparse' arguments are mutually exclusive")
+        if sparse and chunks is not None:
+            raise ValueError("'sparse' and 'chunks' arguments are mutually exclusive")
+        self._dtype = dtype
+
         if other is not None:
-            if shape is not None or default is not None:
+            if shape is not None or (
+                    default is not None and not sparse and chunks is None):
                 raise RuntimeError(
                     "'other' and 'shape'/'default' arguments are mutually exclusive"
                 )
 
             if isinstance(other, NList):
-                self._init_from_nlist(other)
+                self._init_from_nlist(other, sparse, chunks, default)
             elif isinstance(other, Sequence):
                 self._init_from_nested(other)
+                if sparse:
+                    self._data = SparseStorage.from_values(self._data, default)
+                elif chunks is not None:
+                    self._data = ChunkedStorage.from_values(
+                        self._data, self._shape, chunks, default, self._dtype
+                    )
             else:
                 raise TypeError("'other' must be either NList or a Sequence")
         else:
             if shape is None:
                 shape = ()
-            self._init_from_shape(shape, default)
+            self._init_from_shape(shape, default, sparse, chunks)
 
-    def _init_from_nlist(self, other):
-        self._data = other._data.copy()
+    def _init_from_nlist(self, other, sparse=False, chunks=None, default=None):
         self._shape = other.shape
-        self._strides = other._strides
+        self._build_strides()
+        if default is None and isinstance(other._data, (SparseStorage, ChunkedStorage)):
+            default = other._data.default
+        if sparse:
+            self._dtype = None
+            if (other._owns_data() and other.sparse and
+                    other._data.default == default):
+                self._data = other._data.copy()
+            else:
+                self._data = SparseStorage.from_values(other._values(), default)
+            return
+
+        if self._dtype is None:
+            self._dtype = other._dtype
+        if chunks is not None:
+            self._data = ChunkedStorage.from_values(
+                other._values(), self._shape, chunks, default, self._dtype
+            )
+        elif (other._owns_data() and self._dtype == other._dtype and
+                isinstance(other._data, (list, array.array))):
+            self._data = other._data[:]
+        else:
+            self._data = self._make_storage(other._values())
 
     def _init_from_nested(self, other):
+        # Find the dimensions level by level, keeping only the sequences of
+        # the current level. The scan of a level stops at the first element
+        # that is not a sequence of the same length as the others.
         shape = [len(other)]
-        values = other
-        while True:
-            if (all(isinstance(x, Sequence) for x in values) and
-                    len({len(x) for x in values}) == 1):
-                shape.append(len(values[0]))
-                values = list(itertools.chain(*values))
+        level = [other]
+        while shape[-1] and is_nested(level[0][0]):
+            dim = len(level[0][0])
+            children = []
+            for x in itertools.chain.from_iterable(level):
+                if not is_nested(x) or len(x) != dim:
+                    break
+                children.append(x)
             else:
-                break
+                shape.append(dim)
+                level = children
+                continue
+            break
+
+        values = other
+        for _ in range(len(shape) - 1):
+            values = itertools.chain.from_iterable(values)
         self._shape = tuple(shape)
         self._build_strides()
-        self._data = values
+        self._data = self._make_storage(values)
 
-    def _init_from_shape(self, shape, default):
+    def _init_from_shape(self, shape, default, sparse=False, chunks=None):
         self._check_shape(shape)
 
         self._shape = shape
         self._build_strides()
-        self._data = [default] * self.size
+        if sparse:
+            self._data = SparseStorage(self.size, default)
+        elif chunks is not None:
+            self._data = ChunkedStorage(shape, chunks, default, self._dtype)
+        elif self._dtype is None:
+            self._data = [default] * self.size
+        else:
+            if default is None:
+                default = 0
+            self._data = array.array(self._dtype, [default]) * self.size
+
+    @classmethod
+    def _from_flat(cls, data, shape, dtype=None):
+        """Creates an NList of `shape` that adopts `data` as its storage."""
+        result = object.__new__(cls)
+        result._data = data
+        result._dtype = dtype
+        result._shape = shape
+        result._build_strides()
+        return result
+
+    @classmethod
+    def from_flat(cls, values, shape, copy=False):
+        """Creates an NList of `shape` from its elements in iteration order.
+
+        :param values: A sequence of the elements. A list or an
+            :class:`array.array` is used as the NList's storage as is, unless
+            `copy` is set; other sequences are copied into a list.
+        :param tuple shape: Shape of the NList.
+        :param bool copy: Copy lists and arrays instead of sharing them.
+        :raises ValueError: If the number of values does not match `shape`.
+        :rtype: NList
+        """
+        cls._check_shape(shape)
+        shape = tuple(shape)
+        if isinstance(values, array.array):
+            data, dtype = values[:] if copy else values, values.typecode
+        elif isinstance(values, list):
+            data, dtype = values[:] if copy else values, None
+        else:
+            data, dtype = list(values), None
+        if len(data) != product(shape):
+            raise ValueError(
+                'Got %s values for shape %s' % (len(data), shape)
+            )
+        return cls._from_flat(data, shape, dtype)
+
+    @classmethod
+    def from_iter(cls, iterable, shape, dtype=None):
+        """Creates an NList of `shape` from an iterable of its elements in
+        iteration order, consuming it once.
+
+        :param str dtype: An :mod:`array` typecode to store the elements with.
+        :raises ValueError: If the number of values does not match `shape`.
+        :rtype: NList
+        """
+        cls._check_shape(shape)
+        shape = tuple(shape)
+        size = product(shape)
+        iterator = iter(iterable)
+        if dtype is None:
+            data = list(islice(iterator, size))
+        else:
+            data = array.array(dtype, islice(iterator, size))
+        if len(data) != size or next(iterator, missing) is not missing:
+            raise ValueError('Number of values does not match shape %s' % (shape,))
+        return cls._from_flat(data, shape, dtype)
+
+    @classmethod
+    def fromfunction(cls, func, shape, dtype=None):
+        """Creates an NList of `shape` whose element at every index
+        ``(i, j, ...)`` is ``func(i, j, ...)``.
+
+        :param str dtype: An :mod:`array` typecode to store the elements with.
+        :rtype: NList
+        """
+        cls._check_shape(shape)
+        shape = tuple(shape)
+        values = itertools.starmap(func, itertools.product(*map(range, shape)))
+        if dtype is None:
+            return cls._from_flat(list(values), shape)
+        return cls._from_flat(array.array(dtype, values), shape, dtype)
+
+    @classmethod
+    def open_mmap(cls, path, shape, dtype, mode='r'):
+        """Creates an NList backed by a memory-mapped file.
+
+        The file holds the elements in iteration order, as raw values of
+        `dtype` in native byte order. Only the parts of the file that are
+        accessed are read into memory, and with a writable mode changes
+        go straight to the file.
+
+        :param path: A path to the file.
+        :param tuple shape: Shape of the NList.
+        :param str dtype: An :mod:`array` typecode of the elements.
+        :param str mode: 'r' to open an existing file read-only, 'r+' to open
+            an existing file for reading and writing, or 'w+' to create or
+            overwrite a file filled with zeros.
+        :raises ValueError: If the file size does not match `shape` and `dtype`.
+        :rtype: NList
+        """
+        if dtype not in array.typecodes:
+            raise ValueError('Unsupported dtype %r' % (dtype,))
+        if mode not in ('r', 'r+', 'w+'):
+            raise ValueError("Mode must be one of 'r', 'r+' or 'w+'")
+        cls._check_shape(shape)
+        shape = tuple(shape)
+        length = product(shape) * array.array(dtype).itemsize
+
+        with open(path, 'rb' if mode == 'r' else mode[0] + 'b+') as f:
+            if mode == 'w+':
+                f.truncate(length)
+            elif f.seek(0, 2) != length:
+                raise ValueError(
+                    'File size does not match shape %s and dtype %r'
+                    % (shape, dtype)
+                )
+            if length == 0:
+                buffer = bytearray()
+            elif mode == 'r':
+                buffer = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+            else:
+                buffer = mmap.mmap(f.fileno(), length)
+        return cls._from_flat(memoryview(buffer).cast(dtype), shape, dtype)
+
+    @classmethod
+    def from_buffer(cls, obj, shape, dtype=None):
+        """Creates an NList that shares storage with an object supporting the
+        buffer protocol, such as a :class:`bytearray` or a NumPy array.
+
+        :param obj: A C-contiguous buffer holding the elements in iteration
+            order.
+        :param tuple shape: Shape of the NList.
+        :param str dtype: An :mod:`array` typecode of the elements. Defaults
+            to the format of the buffer.
+        :raises ValueError: If the buffer size does not match `shape`.
+        :rtype: NList
+        """
+        buffer = memoryview(obj)
+        if dtype is None:
+            dtype = buffer.format
+        if dtype not in array.typecodes:
+            raise ValueError('Unsupported dtype %r' % (dtype,))
+        cls._check_shape(shape)
+        shape = tuple(shape)
+
+        data = buffer.cast('B').cast(dtype)
+        if len(data) != product(shape):
+            raise ValueError(
+                'Buffer of %s elements does not match shape %s'
+                % (len(data), shape)
+            )
+        return cls._from_flat(data, shape, dtype)
+
+    def as_memoryview(self):
+        """Returns a :class:`memoryview` of the NList's elements with
+        the NList's shape, sharing storage with it.
+
+        :raises TypeError: If the NList has no `dtype`.
+        :raises BufferError: If the NList is chunked or a non-contiguous view,
+            or if it is empty and has more than one dimension.
+        """
+        if self._dtype is None:
+            raise TypeError('Only typed NLists support the buffer protocol')
+        if not isinstance(self._data, (array.array, memoryview)):
+            raise BufferError('NList is stored in chunks')
+        if not self._contiguous:
+            raise BufferError('NList is not contiguous')
+
+        flat = memoryview(self._data)[self._offset:self._offset + self._size]
+        if self._rank == 1:
+            return flat
+        if self._size == 0:
+            raise BufferError('Cannot export an empty NList of shape %s' % (self._shape,))
+        return flat.cast('B').cast(self._dtype, self._shape)
+
+    # Only used by Python 3.12 and later, see PEP 688
+    def __buffer__(self, flags):
+        return self.as_memoryview()
+
+    @property
+    def __array_interface__(self):
+        if not isinstance(self._data, (array.array, memoryview)):
+            raise AttributeError('Only typed NLists support the array interface')
+        itemsize = self._data.itemsize
+        buffer = memoryview(self._data)
+        return {
+            'version': 3,
+            'shape': self._shape,
+            'typestr': array_typestr(self._dtype),
+            'data': buffer,
+            'offset': self._offset * itemsize,
+            'strides': (
+                None if self._contiguous
+                else tuple(stride * itemsize for stride in self._strides)
+            ),
+        }
+
+    def to_numpy(self):
+        """Returns a NumPy array sharing storage with a typed NList.
+        Requires NumPy.
+
+        :raises TypeError: If the NList has no `dtype`.
+        :raises BufferError: If the NList is chunked.
+        """
+        # Without the array interface NumPy would silently wrap the NList
+        # in a zero-dimensional object array
+        if self._dtype is None:
+            raise TypeError('Only typed NLists can be converted to NumPy arrays')
+        if not isinstance(self._data, (array.array, memoryview)):
+            raise BufferError('NList is stored in chunks')
+        import numpy
+        return numpy.asarray(self)
+
+    def save(self, file):
+        """Writes the NList to a file in a compact binary format.
+
+        Elements of a typed NList are written as a raw buffer, so that
+        :meth:`load` can read them back without per-element work. Other
+        NLists are pickled.
+
+        :param file: A path or a binary file object.
+        """
+        header = {
+            'shape': list(self._shape),
+            'strides': list(contiguous_strides(self._shape)),
+            'dtype': self._dtype,
+            'byteorder': sys.byteorder,
+        }
+        header = json.dumps(header).encode('utf-8')
+
+        f, should_close = open_file(file, 'wb')
+        try:
+            f.write(FILE_MAGIC + struct.pack('<BI', FILE_VERSION, len(header)))
+            f.write(header)
+            if self._dtype is not None:
+                f.write(self._typed_data())
+            else:
+                pickle.dump(self._pickled_data(), f, pickle.HIGHEST_PROTOCOL)
+        finally:
+            if should_close:
+                f.close()
+
+    @classmethod
+    def load(cls, file):
+        """Reads an NList written by :meth:`save`.
+
+        :param file: A path or a binary file object.
+        :raises ValueError: If the file is not in the NList format.
+        :rtype: NList
+        """
+        f, should_close = open_file(file, 'rb')
+        try:
+            prefix = f.read(len(FILE_MAGIC) + 5)
+            if not prefix.startswith(FILE_MAGIC) or len(prefix) != len(FILE_MAGIC) + 5:
+                raise ValueError('Not an NList file')
+            version, header_length = struct.unpack('<BI', prefix[len(FILE_MAGIC):])
+            if version != FILE_VERSION:
+                raise ValueError('Unsupported NList file version %s' % version)
+            header = json.loads(f.read(header_length).decode('utf-8'))
+
+            shape, dtype = tuple(header['shape']), header['dtype']
+            if dtype is None:
+                data = pickle.load(f)
+            else:
+                data = array.array(dtype)
+                data.fromfile(f, product(shape))
+                if header['byteorder'] != sys.byteorder:
+                    data.byteswap()
+        finally:
+            if should_close:
+                f.close()
+        return cls._from_flat(data, shape, dtype)
+
+    def __reduce_ex__(self, protocol):
+        if self._dtype is None:
+            data = self._pickled_data()
+        else:
+            data = self._typed_data()
+            if protocol >= 5 and hasattr(pickle, 'PickleBuffer'):
+                data = pickle.PickleBuffer(data)
+        return (unpickle_nlist, (type(self), data, self._shape, self._dtype))
+
+    def _typed_data(self):
+        """Returns the elements of a typed NList in an array of their own."""
+        if self._owns_data() and isinstance(self._data, array.array):
+            return self._data
+        return self._make_storage(self._values())
+
+    def _pickled_data(self):
+        if self.sparse and self._owns_data():
+            return self._data
+        return list(self._values())
+
+    def flush(self):
+        """Writes changes of a memory-mapped NList to its file.
+        Does nothing for other NLists.
+        """
+        if isinstance(self._data, memoryview) and isinstance(self._data.obj, mmap.mmap):
+            self._data.obj.flush()
+
+    def _make_storage(self, values):
+        if self._dtype is None:
+            return list(values)
+        return array.array(self._dtype, values)
 
     def _build_strides(self):
-        self._strides = tuple(
-            product(self.shape[j] for j in range(k + 1, self.rank))
-            for k in range(self.rank)
-        )
+        self._strides = contiguous_strides(self._shape)
+        self._offset = 0
+        self._init_layout()
+
+    def _make_view(self, shape, strides, offset):
+        view = object.__new__(type(self))
+        view._is_view = True
+        view._data = self._data
+        view._dtype = self._dtype
+        view._shape = shape
+        view._strides = strides
+        view._offset = offset
+        view._init_layout()
+        return view
+
+    def _init_layout(self):
+        """Caches values derived from `_shape` and `_strides`."""
+        self._rank = len(self._shape)
+        self._size = product(self._shape)
+        self._contiguous = self._strides == contiguous_strides(self._shape)
+        if self._rank < len(FLAT_INDEX_BY_RANK):
+            self._flat_index = FLAT_INDEX_BY_RANK[self._rank]
+            self._unchecked_flat_index = UNCHECKED_FLAT_INDEX_BY_RANK[self._rank]
+        else:
+            self._flat_index = flat_index_n
+            self._unchecked_flat_index = unchecked_flat_index_n
 
     @property
     def shape(self):
         """A tuple with the NList's dimensions. Read-only."""
         return self._shape
 
+    @property
+    def dtype(self):
+        """Typecode of the NList's storage, or None for a list of objects.
+        Read-only.
+        """
+        return self._dtype
+
+    @property
+    def sparse(self):
+        """Whether the NList only stores elements different from its default
+        value. Read-only.
+        """
+        return isinstance(self._data, SparseStorage)
+
+    @property
+    def chunks(self):
+        """Shape of the tiles the NList's elements are stored in,
+        or None if they are not stored in tiles. Read-only.
+        """
+        if isinstance(self._data, ChunkedStorage):
+            return self._data.chunks
+        return None
+
     @property
     def rank(self):
         """Number of the NList's dimensions. Read-only."""
-        return len(self.shape)
+        return self._rank
 
     @property
     def size(self):
         """Number of elements in the NList. Read-only."""
-        return product(self.shape)
+        return self._size
 
     def __bool__(self):
-        return self.size != 0
+        return self._size != 0
 
     def __eq__(self, other):
-        return (
-            isinstance(other, NList) and
-            self.shape == other.shape and
-            self._data == other._data
-        )
+        if not isinstance(other, NList) or self.shape != other.shape:
+            return False
+        if (self._owns_data() and other._owns_data() and
+                type(self._data) is type(other._data)):
+            return self._data == other._data
+        return all(a == b for a, b in zip(self._values(), other._values()))
 
     def __getitem__(self, key):
-        return self._data[self._index_to_flat(key)]
+        try:
+            flat = self._flat_index(self, key)
+        except TypeError:
+            if has_slices(key):
+                return self._view(key)
+            raise
+        return self._data[flat]
 
     def __setitem__(self, key, value):
-        self._data[self._index_to_flat(key)] = value
+        try:
+            flat = self._flat_index(self, key)
+        except TypeError:
+            if has_slices(key):
+                self._assign_view(self._view(key), value)
+                return
+            raise
+        self._data[flat] = value
 
-    def __iter__(self):
-        return iter(self._data)
+    def get_unchecked(self, index):
+        """Returns the element at `index` without validating the index.
 
-    def __repr__(self):
-        nested = self._to_nested()
-        return 'NList(%s, shape=%s)' % (nested, self.shape)
+        Meant for tight loops where the caller guarantees that `index` is
+        a valid index for the NList; the result is unspecified otherwise.
+        """
+        return self._data[self._unchecked_flat_index(self, index)]
 
-    def __str__(self):
-        return repr(self)
+    def set_unchecked(self, index, value):
+        """Sets the element at `index` without validating the index.
 
-    def copy(self):
-        """Returns a shallow copy of the NList.
+        The same caveats as for :meth:`get_unchecked` apply.
+        """
+        self._data[self._unchecked_flat_index(self, index)] = value
 
+    def parallel_map(self, func, processes=None, chunksize=None):
+        """Like :meth:`map` with a single NList, but calls `func` in a pool
+        of worker processes.
+
+        The NList is split along its first dimension into blocks of
+        consecutive elements, and every block is sent to a worker once.
+        Elements of a typed NList are shared with the workers through
+        shared memory when it is available.
+
+        :param func: A picklable function, e.g. one defined at the top level
+            of a module.
+        :param int processes: Number of worker processes. Defaults to the
+            number of CPUs.
+        :param int chunksize: Number of indexes along the first dimension
+            in a block. Defaults to a value giving each worker several blocks.
         :rtype: NList
         """
-        return type(self)(other=self)
+        results = self._process_blocks(map_values, func, processes, chunksize)
+        return type(self)._from_flat(
+            list(itertools.chain.from_iterable(results)), self._shape
+        )
 
-    def count(self, value):
-        """Returns the number of occurrences of `value` in the NList.
+    def parallel_reduce(self, func, initial=missing, processes=None,
+                        chunksize=None):
+        """Like :meth:`reduce` over all elements, but reduces blocks of the
+        NList in a pool of worker processes, and then reduces the results
+        of the blocks.
 
-        :rtype: int
+        `func` must be associative and picklable. See :meth:`parallel_map`
+        for the meaning of the other arguments.
         """
-        return self._data.count(value)
+        results = self._process_blocks(reduce, func, processes, chunksize)
+        if initial is missing:
+            return reduce(func, results)
+        return reduce(func, results, initial)
 
-    def keys(self, start=None, stop=None):
-        """Returns an iterable of all indexes valid for the NList.
+    def _process_blocks(self, operation, func, processes, chunksize):
+        """Applies `operation` to `func` and blocks of the NList's elements
+        along its first dimension in worker processes. Returns a list of
+        results for the blocks.
+        """
+        if self._size == 0:
+            return []
+        if self._rank == 0:
+            return [operation(func, list(self._values()))]
 
-        :param tuple start: An index to start iteration from.
-        :param tuple stop: An index before which to stop iteration.
+        processes = processes or os.cpu_count() or 1
+        rows = self._shape[0]
+        if chunksize is None:
+            chunksize = -(-rows // (processes * 4))
+        if chunksize <= 0:
+            raise ValueError('chunksize must be positive')
+        row_size = self._size // rows
+        bounds = [
+            (start * row_size, min(start + chunksize, rows) * row_size)
+            for start in range(0, rows, chunksize)
+        ]
 
-        `start` and `stop` must be valid indexes for the NList, or `None`.
-        """
-        if start is not None:
-            self._check_index(start)
-        else:
-            start = (0,) * self.rank
-        if stop is not None:
-            self._check_index(stop)
+        shared_memory = None
+        if self._dtype is not None and self._dtype in MEMORYVIEW_TYPECODES:
+            try:
+                from multiprocessing import shared_memory
+            except ImportError:
+                pass
 
-        current = start
-        while self._index_in_range(current, stop):
-            yield current
-            current = self._next_index(current)
+        from concurrent.futures import ProcessPoolExecutor
+        memory = None
+        try:
+            if shared_memory is not None:
+                data = memoryview(self._typed_data()).cast('B')
+                memory = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+                memory.buf[:len(data)] = data
+                data.release()
+                blocks = [
+                    SharedBlock(memory.name, self._dtype, start, stop)
+                    for start, stop in bounds
+                ]
+            else:
+                values = self.contiguous()._values()
+                blocks = [values[start:stop] for start, stop in bounds]
 
-    def _index_in_range(self, index, stop):
-        return (
-            index is not None and
-            self._in_bounds(index) and
-            (stop is None or index < stop)
-        )
+            with ProcessPoolExecutor(processes) as executor:
+                return list(executor.map(
+                    process_block, repeat(operation), repeat(func), blocks
+                ))
+        finally:
+            if memory is not None:
+                memory.close()
+                memory.unlink()
 
-    def _next_index(self, index):
-        current = list(index)
-        i = self.rank - 1
-        while i >= 0:
-            current[i] += 1
+    def map_threaded(self, func, max_workers=None):
+        """Like :meth:`map` with a single NList, but calls `func` in a pool
+        of threads. Meant for functions that spend their time waiting for I/O.
 
-            if current[i] >= self.shape[i]:
-                current[i] = 0
-                i -= 1
-            else:
-                return tuple(current)
+        :param int max_workers: Maximum number of calls running at once.
+            Defaults to the default of
+            :class:`concurrent.futures.ThreadPoolExecutor`.
+        :raises: The first exception raised by `func`, after which calls that
+            have not started yet are cancelled.
+        :rtype: NList
+        """
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        if max_workers is None:
+            max_workers = min(32, (os.cpu_count() or 1) + 4)
+        values = list(self._values())
+        results = [None] * len(values)
+
+        def work(position):
+            results[position] = func(values[position])
+
+        def wait_for(futures):
+            done, pending = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    for other in pending:
+                        other.cancel()
+                    raise future.exception()
+            return pending
+
+        # Only keep a bounded number of calls queued, so that an error
+        # leaves little work to cancel and memory does not grow with size.
+        # A new call is queued as soon as any call completes.
+        with ThreadPoolExecutor(max_workers) as executor:
+            pending = set()
+            for position in range(len(values)):
+                if len(pending) >= 2 * max_workers:
+                    pending = wait_for(pending)
+                pending.add(executor.submit(work, position))
+            while pending:
+                pending = wait_for(pending)
+        return type(self)._from_flat(results, self._shape)
+
+    async def amap(self, func, concurrency=10):
+        """Like :meth:`map` with a single NList, but for a coroutine function.
+
+        :param func: A coroutine function accepting an element.
+        :param int concurrency: Maximum number of calls running at once.
+        :raises: The first exception raised by `func`, after which the other
+            running calls are cancelled.
+        :rtype: NList
+        """
+        if concurrency <= 0:
+            raise ValueError('concurrency must be positive')
+        values = list(self._values())
+        results = [None] * len(values)
+        positions = iter(range(len(values)))
+
+        async def worker():
+            for position in positions:
+                results[position] = await func(values[position])
+
+        workers = [
+            asyncio.ensure_future(worker())
+            for _ in range(min(concurrency, len(values)))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        return type(self)._from_flat(results, self._shape)
+
+    def lazy(self):
+        """Returns a :class:`LazyNList` expression consisting of this NList.
+
+        :rtype: LazyNList
+        """
+        return LazyNList._leaf(self)
+
+    def reshape(self, shape):
+        """Returns a view of the NList with a different shape and the same
+        elements in the same iteration order.
+
+        :param tuple shape: The new shape. One of its dimensions may be -1,
+            in which case it is inferred from the size of the NList.
+        :raises ValueError: If the size of `shape` differs from the size of
+            the NList, or if the NList is not contiguous
+            (see :meth:`contiguous`).
+        :rtype: NList
+        """
+        shape = tuple(shape)
+        if shape.count(-1) > 1:
+            raise ValueError('Only one dimension can be inferred')
+        if -1 in shape:
+            known = product(x for x in shape if x != -1)
+            if known == 0 or self._size % known:
+                raise ValueError(
+                    'Cannot reshape NList of size %s into shape %s'
+                    % (self._size, shape)
+                )
+            shape = tuple(self._size // known if x == -1 else x for x in shape)
+        self._check_shape(shape)
+        if product(shape) != self._size:
+            raise ValueError(
+                'Cannot reshape NList of size %s into shape %s'
+                % (self._size, shape)
+            )
+        if not self._contiguous:
+            raise ValueError(
+                'Cannot reshape a non-contiguous NList without copying, '
+                'call contiguous() first'
+            )
+        return self._make_view(shape, contiguous_strides(shape), self._offset)
+
+    def transpose(self, *axes):
+        """Returns a view of the NList with permuted dimensions.
+
+        :param axes: A permutation of ``range(rank)``: dimension k of the
+            result is dimension ``axes[k]`` of the NList. If omitted,
+            the order of dimensions is reversed.
+        :raises ValueError: If `axes` is not a permutation.
+        :rtype: NList
+        """
+        if not axes:
+            axes = tuple(reversed(range(self._rank)))
+        if sorted(axes) != list(range(self._rank)):
+            raise ValueError(
+                'Axes %s are not a permutation of the dimensions' % (axes,)
+            )
+        return self._make_view(
+            tuple(self._shape[k] for k in axes),
+            tuple(self._strides[k] for k in axes),
+            self._offset,
+        )
+
+    @property
+    def T(self):
+        """A view of the NList with its dimensions reversed,
+        see :meth:`transpose`.
+        """
+        return self.transpose()
+
+    def swapaxes(self, axis1, axis2):
+        """Returns a view of the NList with two dimensions interchanged.
+
+        :rtype: NList
+        """
+        axes = list(range(self._rank))
+        axes[axis1], axes[axis2] = axes[axis2], axes[axis1]
+        return self.transpose(*axes)
+
+    def contiguous(self):
+        """Returns the NList itself if its elements are laid out in iteration
+        order, or a contiguous copy of it otherwise.
+
+        :rtype: NList
+        """
+        if self._contiguous:
+            return self
+        return self._compact_copy()
+
+    def append(self, block, axis=0):
+        """Appends a block of elements at the end of a dimension, increasing
+        it by one.
+
+        :param block: An NList or a nested sequence with the shape of the
+            NList without dimension `axis`, e.g. a row of a 2-dimensional
+            NList when `axis` is 0. For a 1-dimensional NList, the element
+            to append.
+        :param int axis: The dimension to grow.
+        :raises ValueError: If `block` has a wrong shape.
+
+        See :meth:`extend` for the complexity and the restrictions.
+        """
+        self._check_axis(axis)
+        if self._rank == 1:
+            block = type(self)._from_flat([block], ())
+        elif not isinstance(block, NList):
+            block = NList(block)
+        shape = self._shape[:axis] + self._shape[axis + 1:]
+        if block.shape != shape:
+            raise ValueError(
+                'Cannot append block of shape %s along axis %s of shape %s'
+                % (block.shape, axis, self._shape)
+            )
+        self.extend(block._make_view(
+            shape[:axis] + (1,) + shape[axis:],
+            block._strides[:axis] + (0,) + block._strides[axis:],
+            block._offset,
+        ), axis)
+
+    def extend(self, values, axis=0):
+        """Appends elements at the end of a dimension.
+
+        :param values: An NList or a nested sequence with the same shape as
+            the NList, except along dimension `axis`.
+        :param int axis: The dimension to grow.
+        :raises ValueError: If `values` has a wrong shape, or if the NList is
+            a view.
+        :raises TypeError: If the elements are not stored in a list or an array.
+
+        Growing dimension 0 writes to the end of the storage and takes
+        amortised time proportional to the number of elements added. Other
+        dimensions are over-allocated the way lists are: the storage keeps
+        room for more elements along them, so that appending to them is
+        amortised linear as well. Meanwhile the NList is not contiguous.
+        Views of the NList taken before it grew keep showing the old elements
+        if the storage had to be reallocated.
+        """
+        self._check_axis(axis)
+        if not isinstance(values, NList):
+            values = NList(values)
+        if (values.rank != self._rank or
+                values.shape[:axis] + values.shape[axis + 1:] !=
+                self._shape[:axis] + self._shape[axis + 1:]):
+            raise ValueError(
+                'Cannot extend NList of shape %s with shape %s along axis %s'
+                % (self._shape, values.shape, axis)
+            )
+        start = self._shape[axis]
+        shape = list(self._shape)
+        shape[axis] += values.shape[axis]
+
+        # Convert the values first, so that invalid ones leave the NList as it was
+        data = self._make_storage(values._values())
+        if axis == 0 and self._storage_shape() == self._shape:
+            self._data.extend(data)
+            self._shape = tuple(shape)
+            self._build_strides()
+            return
+        self._reserve(tuple(shape), None)
+        key = tuple(slice(None) for _ in range(self._rank))
+        key = key[:axis] + (slice(start, None),) + key[axis + 1:]
+        self._assign_view(
+            self._view(key), NList._from_flat(data, values.shape, self._dtype)
+        )
+
+    def resize(self, shape, fill=None):
+        """Changes the dimensions of the NList in place, keeping the elements
+        whose indexes fit in the new shape.
+
+        :param tuple shape: The new shape, of the same rank.
+        :param fill: The value of the added elements. Defaults to None,
+            or 0 for a typed NList.
+        :raises ValueError: If `shape` has a different rank, or if the NList
+            is a view.
+        :raises TypeError: If the elements are not stored in a list or an array.
+
+        See :meth:`extend` for the complexity.
+        """
+        shape = tuple(shape)
+        self._check_shape(shape)
+        if len(shape) != self._rank:
+            raise ValueError('Cannot resize NList of rank %s to shape %s' % (self._rank, shape))
+        old = self._shape
+        if shape == old:
+            return
+        self._reserve(shape, fill)
+        key = tuple(slice(None) for _ in range(self._rank))
+        for axis, (before, after) in enumerate(zip(old, shape)):
+            if after > before:
+                self[key[:axis] + (slice(before, None),) + key[axis + 1:]] = self._fill_value(fill)
+
+    def _storage_shape(self):
+        """Returns the shape that the storage is laid out for: the shape of
+        the NList, or a larger one if it has room to grow along some
+        dimensions.
+        """
+        if not isinstance(self._data, (list, array.array)):
+            raise TypeError('Only NLists stored in a list or an array can grow')
+        if self._is_view:
+            raise ValueError('A view of an NList cannot grow')
+        capacity = self.__dict__.get('_capacity')
+        if capacity is not None:
+            return capacity
+        return self._shape
+
+    def _fill_value(self, fill):
+        if fill is None and self._dtype is not None:
+            return 0
+        return fill
+
+    def _reserve(self, shape, fill):
+        """Changes the shape of the NList, reallocating the storage with
+        room to spare if a dimension other than 0 outgrows it. Added
+        elements are undefined.
+        """
+        capacity = self._storage_shape()
+        grown = (shape[0],) + tuple(
+            room if dim <= room else dim + (dim >> 3) + 6
+            for dim, room in zip(shape[1:], capacity[1:])
+        )
+        fill = self._fill_value(fill)
+        if grown[1:] != capacity[1:]:
+            data = self._make_storage(repeat(fill, product(grown)))
+            if isinstance(self._data, ValueIndexedList):
+                data = ValueIndexedList(data)
+            common = tuple(slice(min(a, b)) for a, b in zip(self._shape, shape))
+            self._assign_view(
+                type(self)._from_flat(data, grown, self._dtype)._view(common),
+                self._view(common),
+            )
+            self._data = data
+            capacity = grown
+
+        length = shape[0] * product(capacity[1:])
+        if len(self._data) < length:
+            self._data.extend(self._make_storage(repeat(fill, length - len(self._data))))
+        elif len(self._data) > length:
+            del self._data[length:]
+        self._shape = shape
+        self._strides = contiguous_strides(capacity)
+        self._offset = 0
+        self._init_layout()
+        if self._contiguous:
+            self.__dict__.pop('_capacity', None)
         else:
-            return None
+            self._capacity = (shape[0],) + capacity[1:]
+
+    def _check_axis(self, axis):
+        if not isinstance(axis, int):
+            raise TypeError('Axis must be an integer')
+        if not 0 <= axis < self._rank:
+            raise ValueError(
+                'Axis %s is out of range for rank %s' % (axis, self._rank)
+            )
+
+    def map(self, func, *others):
+        """Returns a new NList with `func` applied to the elements.
+
+        :param func: A function accepting one argument per NList: the
+            element of this NList and the corresponding elements of `others`.
+        :param others: NLists or scalars to pass to `func` alongside
+            this NList's elements.
+        :raises ValueError: If the shapes cannot be broadcast together.
+        :rtype: NList
+
+        Shapes are broadcast the way NumPy does it: they are aligned on the
+        last dimension, and dimensions of size 1 (or missing ones) are
+        stretched to match the other shapes. Any value that is not an NList
+        is treated as a scalar and passed to every call. If any of `others`
+        is a :class:`LazyNList`, the result is a LazyNList too, and so are the
+        results of operators with a LazyNList on either side.
+        """
+        if any(isinstance(x, LazyNList) for x in others):
+            return self.lazy().map(func, *others)
+        operands = (self,) + others
+        shape = broadcast_shapes(
+            *(x.shape for x in operands if isinstance(x, NList))
+        )
+        columns = [
+            x._broadcast_to(shape)._values() if isinstance(x, NList) else repeat(x)
+            for x in operands
+        ]
+        return type(self)._from_flat(list(map(func, *columns)), shape)
+
+    __add__ = elementwise(operator.add)
+    __sub__ = elementwise(operator.sub)
+    __mul__ = elementwise(operator.mul)
+    __truediv__ = elementwise(operator.truediv)
+    __floordiv__ = elementwise(operator.floordiv)
+    __mod__ = elementwise(operator.mod)
+    __pow__ = elementwise(operator.pow)
+    __radd__ = reflected(operator.add)
+    __rsub__ = reflected(operator.sub)
+    __rmul__ = reflected(operator.mul)
+    __rtruediv__ = reflected(operator.truediv)
+    __rfloordiv__ = reflected(operator.floordiv)
+    __rmod__ = reflected(operator.mod)
+    __rpow__ = reflected(operator.pow)
+    __lt__ = elementwise(operator.lt)
+    __le__ = elementwise(operator.le)
+    __gt__ = elementwise(operator.gt)
+    __ge__ = elementwise(operator.ge)
+
+    def __neg__(self):
+        return self.map(operator.neg)
+
+    def __pos__(self):
+        return self.map(operator.pos)
+
+    def __abs__(self):
+        return self.map(abs)
+
+    def _broadcast_to(self, shape):
+        if shape == self._shape:
+            return self
+        lead = len(shape) - self._rank
+        strides = (0,) * lead + tuple(
+            0 if dim == 1 and n != 1 else stride
+            for dim, n, stride in zip(self._shape, shape[lead:], self._strides)
+        )
+        return self._make_view(shape, strides, self._offset)
+
+    def reduce(self, func, axis=None, initial=missing):
+        """Reduces the NList's elements with a two-argument function,
+        like :func:`functools.reduce`.
+
+        :param func: A function combining an accumulated value and an element.
+        :param int axis: The dimension to reduce along, or None to reduce
+            all elements to a single value.
+        :param initial: A value to start every reduction with.
+        :returns: A value if `axis` is None, otherwise an NList whose shape
+            is the NList's shape without dimension `axis`.
+        """
+        if initial is missing:
+            return self._aggregate(lambda xs: reduce(func, xs), axis)
+        return self._aggregate(lambda xs: reduce(func, xs, initial), axis)
+
+    def sum(self, axis=None, start=0):
+        """Sums elements like :func:`sum`, either all of them or along `axis`.
+
+        See :meth:`reduce` for the meaning of `axis` and the return value.
+        """
+        return self._aggregate(lambda xs: sum(xs, start), axis)
+
+    def min(self, axis=None, default=missing):
+        """Finds the smallest element like :func:`min`, either overall or
+        along `axis`.
+
+        :param default: A value to return for empty sequences of elements.
+
+        See :meth:`reduce` for the meaning of `axis` and the return value.
+        """
+        if default is missing:
+            return self._aggregate(min, axis)
+        return self._aggregate(lambda xs: min(xs, default=default), axis)
+
+    def max(self, axis=None, default=missing):
+        """Finds the largest element like :func:`max`, either overall or
+        along `axis`.
+
+        :param default: A value to return for empty sequences of elements.
+
+        See :meth:`reduce` for the meaning of `axis` and the return value.
+        """
+        if default is missing:
+            return self._aggregate(max, axis)
+        return self._aggregate(lambda xs: max(xs, default=default), axis)
+
+    def any(self, axis=None):
+        """Checks if any element is true, either overall or along `axis`.
+
+        See :meth:`reduce` for the meaning of `axis` and the return value.
+        """
+        return self._aggregate(any, axis)
+
+    def all(self, axis=None):
+        """Checks if all elements are true, either overall or along `axis`.
+
+        See :meth:`reduce` for the meaning of `axis` and the return value.
+        """
+        return self._aggregate(all, axis)
+
+    def _aggregate(self, func, axis):
+        if axis is None:
+            return func(self._values())
+        if not isinstance(axis, int):
+            raise TypeError('Axis must be an integer')
+        if not 0 <= axis < self._rank:
+            raise ValueError(
+                'Axis %s is out of range for rank %s' % (axis, self._rank)
+            )
+
+        # Move `axis` to the end, so that every innermost row of the
+        # resulting view holds the elements to aggregate together
+        shape = self._shape[:axis] + self._shape[axis + 1:]
+        strides = self._strides[:axis] + self._strides[axis + 1:]
+        if self._shape[axis] == 0:
+            groups = repeat((), product(shape))
+        else:
+            groups = self._make_view(
+                shape + self._shape[axis:axis + 1],
+                strides + self._strides[axis:axis + 1],
+                self._offset,
+            )._run_values()
+        return type(self)._from_flat(list(map(func, groups)), shape)
+
+    def __iter__(self):
+        return iter(self._values())
+
+    def __contains__(self, value):
+        return value in self._values()
+
+    def __repr__(self):
+        if self._rank == 0:
+            nested = str(self._data[self._offset])
+        elif self._size == 0:
+            nested = '[]'
+        elif self._size > self.repr_threshold:
+            nested = self._nested_repr(0, self._offset, self.repr_edgeitems)
+        else:
+            nested = self._nested_repr(0, self._offset, None)
+        if self._dtype is None:
+            return 'NList(%s, shape=%s)' % (nested, self.shape)
+        return 'NList(%s, shape=%s, dtype=%r)' % (nested, self.shape, self._dtype)
+
+    def __str__(self):
+        return repr(self)
+
+    def copy(self):
+        """Returns a shallow copy of the NList.
+
+        A sparse or chunked NList is copied in constant time: the copy shares
+        storage with the original until one of them is written to. Then only
+        the tile written to (or the dict of stored elements of a sparse
+        NList) is copied.
+
+        :rtype: NList
+        """
+        if self._owns_data() and isinstance(self._data, (SparseStorage, ChunkedStorage)):
+            return type(self)._from_flat(self._data.copy(), self._shape, self._dtype)
+        return self._compact_copy()
+
+    def _compact_copy(self):
+        """Returns a copy of the NList with its own storage of the same kind,
+        so that copies of sparse and chunked views stay sparse or chunked.
+        """
+        if self.sparse:
+            return type(self)(self, sparse=True)
+        if self.chunks is not None:
+            # A view may have a different number of dimensions than its storage
+            chunks = self.chunks[-self._rank:] if self._rank else ()
+            chunks = (1,) * (self._rank - len(chunks)) + chunks
+            return type(self)(self, chunks=chunks)
+        return type(self)(other=self)
+
+    def freeze(self):
+        """Returns an immutable, hashable copy of the NList.
+
+        :rtype: FrozenNList
+        """
+        return FrozenNList(self)
+
+    def snapshot(self):
+        """Returns a copy of the NList to pass to :meth:`restore` later.
+
+        Taking and restoring snapshots of a chunked NList is cheap, and
+        snapshots only keep the tiles changed since they were taken, so that
+        an undo stack uses memory in proportion to the tiles actually
+        written rather than to the size of the NList. Snapshots of other
+        NLists are full copies, see :meth:`copy`.
+
+        :rtype: NList
+        """
+        return self.copy()
+
+    def restore(self, snapshot):
+        """Sets the elements of the NList to those of `snapshot`.
+
+        :param NList snapshot: An NList of the same shape, usually returned by
+            :meth:`snapshot`. It is not affected by later changes to the NList.
+        :raises ValueError: If the shapes differ.
+        """
+        if snapshot.shape != self._shape:
+            raise ValueError(
+                'Cannot restore NList of shape %s from a snapshot of shape %s'
+                % (self._shape, snapshot.shape)
+            )
+        if (self._owns_data() and snapshot._owns_data() and
+                isinstance(self._data, (SparseStorage, ChunkedStorage)) and
+                self._data.can_share(snapshot._data)):
+            self._data.share(snapshot._data)
+        elif self._rank == 0:
+            self[()] = snapshot[()]
+        else:
+            self._assign_view(self, snapshot)
+
+    def count(self, value):
+        """Returns the number of occurrences of `value` in the NList.
+
+        :rtype: int
+        """
+        if self._owns_data() and not isinstance(self._data, memoryview):
+            return self._data.count(value)
+        return operator.countOf(self._values(), value)
+
+    def keys(self, start=None, stop=None):
+        """Returns an iterable of all indexes valid for the NList.
+
+        :param tuple start: An index to start iteration from.
+        :param tuple stop: An index before which to stop iteration.
+
+        `start` and `stop` must be valid indexes for the NList, or `None`.
+        """
+        first, last = self._key_range(start, stop)
+        if first == 0:
+            keys = itertools.product(*map(range, self._shape))
+        else:
+            keys = self._keys_from(start)
+        return islice(keys, max(last - first, 0))
+
+    def _keys_from(self, start):
+        # All indexes from `start` on are `start` with its last coordinate
+        # counting up, then with its second to last coordinate counting up
+        # and the last one running over its whole range, and so on.
+        ranges = [range(dim) for dim in self._shape]
+        pieces = []
+        for axis in reversed(range(self._rank)):
+            first = start[axis] if axis == self._rank - 1 else start[axis] + 1
+            pieces.append(itertools.product(*(
+                [(x,) for x in start[:axis]] +
+                [range(first, self._shape[axis])] +
+                ranges[axis + 1:]
+            )))
+        return itertools.chain.from_iterable(pieces)
+
+    def flat_keys(self, start=None, stop=None):
+        """Returns a range of positions of the elements in iteration order.
+
+        The position of an element is its index in ``list(nlist)``.
+
+        :param tuple start: An index to start iteration from.
+        :param tuple stop: An index before which to stop iteration.
+
+        `start` and `stop` must be valid indexes for the NList, or `None`.
+        """
+        first, last = self._key_range(start, stop)
+        return range(first, max(first, last))
+
+    def items(self, start=None, stop=None):
+        """Returns an iterable of pairs (index, value) in the NList.
+
+        :param tuple start: An index to start iteration from.
+        :param tuple stop: An index before which to stop iteration.
+
+        `start` and `stop` must be valid indexes for the NList, or `None`.
+        """
+        first, last = self._key_range(start, stop)
+        values = islice(self._values(), first, max(first, last))
+        return zip(self.keys(start, stop), values)
 
     def enumerate(self):
         """Return an iterable of all pairs (index, value) in the NList."""
-        for key in self.keys():
-            yield (key, self[key])
+        return self.items()
+
+    def _key_range(self, start, stop):
+        """Returns positions of `start` and `stop` in iteration order."""
+        positions = contiguous_strides(self._shape)
+        if start is not None:
+            self._check_index(start)
+            first = sum(map(operator.mul, positions, start))
+        else:
+            first = 0
+        if stop is not None:
+            self._check_index(stop)
+            last = sum(map(operator.mul, positions, stop))
+        else:
+            last = self._size
+        return first, last
 
     def index(self, value, start=None, stop=None):
         """Returns index of the first occurrence of `value` in the NList.
@@ -217,21 +1946,512 @@ class NList:
 
         `start` and `stop` must be valid indexes for the NList, or `None`.
         """
-        for key in self.keys(start, stop):
-            if self[key] == value:
-                return key
-        raise ValueError('%s is not in the NList' % value)
+        first, last = self._key_range(start, stop)
+        try:
+            if first >= last:
+                raise ValueError
+            values = self._values()
+            if isinstance(values, (list, SparseStorage)):
+                position = values.index(value, first, last)
+            elif isinstance(values, array.array):
+                position = first + values[first:last].index(value)
+            else:
+                position = first + next(itertools.compress(
+                    itertools.count(),
+                    map(operator.eq, islice(values, first, last), repeat(value))
+                ))
+        except (ValueError, StopIteration):
+            raise ValueError('%s is not in the NList' % (value,))
+        return self._unravel(position)
 
-    def _to_nested(self):
-        if self.rank == 0:
-            return self._data[0]
+    def find_all(self, value):
+        """Returns a list of indexes of all occurrences of `value`
+        in the NList, in iteration order.
+
+        :rtype: list
+        """
+        if (self._owns_data() and
+                isinstance(self._data, (ValueIndexedList, SparseStorage))):
+            positions = sorted(self._data.positions(value))
+        else:
+            positions = itertools.compress(
+                itertools.count(), map(operator.eq, self._values(), repeat(value))
+            )
+        return list(map(self._unravel, positions))
+
+    def argwhere(self, predicate):
+        """Returns a list of indexes of all elements for which `predicate`
+        returns a true value, in iteration order.
+
+        :rtype: list
+        """
+        positions = itertools.compress(
+            itertools.count(), map(predicate, self._values())
+        )
+        return list(map(self._unravel, positions))
+
+    def iter_chunks(self, chunks=None, allocated_only=False):
+        """Returns an iterable of pairs (index, view) that split the NList
+        into tiles.
+
+        Each view covers one tile and shares storage with the NList, and
+        index is the index of the tile's first element in the NList. Tiles at
+        the end of a dimension may be smaller than the others.
+
+        :param tuple chunks: Shape of the tiles. Defaults to :attr:`chunks`.
+        :param bool allocated_only: Skip tiles of a chunked NList that have
+            never been written to and thus consist of default values.
+        :raises ValueError: If `chunks` is not given and the NList is not
+            chunked, or if `allocated_only` is set for an NList that is not
+            stored in tiles of shape `chunks`.
+        """
+        stored = self._data.chunks if isinstance(self._data, ChunkedStorage) else None
+        if chunks is None:
+            chunks = stored
+        if chunks is None:
+            raise ValueError('Tile shape must be given for an NList without chunks')
+        chunks = tuple(chunks)
+        if len(chunks) != self._rank or any(x <= 0 for x in chunks):
+            raise ValueError('Tile shape must have %s positive dimensions' % self._rank)
+        if allocated_only and (stored != chunks or not self._owns_data()):
+            raise ValueError('Only tiles of chunked storage can be allocated')
+        return self._iter_chunks(chunks, allocated_only)
+
+    def _iter_chunks(self, chunks, allocated_only):
+        if self._rank == 0:
+            yield (), self
+            return
+        origins = itertools.product(*(
+            range(0, dim, chunk) for dim, chunk in zip(self._shape, chunks)
+        ))
+        for origin in origins:
+            if allocated_only and not self._data.is_allocated(origin):
+                continue
+            yield origin, self[tuple(
+                slice(start, start + chunk) for start, chunk in zip(origin, chunks)
+            )]
+
+    def nonzero_items(self):
+        """Returns an iterable of pairs (index, value) of the elements of
+        a sparse NList that differ from its default value, in iteration order.
+
+        :raises ValueError: If the NList is not sparse.
+        """
+        if not self.sparse:
+            raise ValueError('nonzero_items() requires a sparse NList')
+        if self._owns_data():
+            return (
+                (self._unravel(position), value)
+                for position, value in self._data.stored_items()
+            )
+        default = self._data.default
+        return (item for item in self.items() if item[1] != default)
+
+    def with_value_index(self):
+        """Returns a copy of the NList that maintains a reverse index
+        from values to their positions.
+
+        The reverse index makes :meth:`index` (without `start`/`stop`),
+        :meth:`count`, :meth:`find_all` and the ``in`` operator take time
+        proportional to the number of occurrences rather than to the size of
+        the NList, at the cost of extra memory and slower element assignment.
+        All elements must be hashable. Views of the returned NList use the
+        index as well, while copies of it do not.
+
+        :raises ValueError: If the NList has a `dtype`.
+        :rtype: NList
+        """
+        if self._dtype is not None:
+            raise ValueError('Value index is not supported for typed NLists')
+        return type(self)._from_flat(ValueIndexedList(self._values()), self._shape)
+
+    def _unravel(self, position):
+        """Converts a position in iteration order to an index."""
+        index = []
+        for dim in reversed(self._shape):
+            position, x = divmod(position, dim)
+            index.append(x)
+        return tuple(reversed(index))
+
+    def take(self, indexes):
+        """Returns a list of the values at all `indexes`.
+
+        :param indexes: Either an iterable of index tuples, or a tuple of
+            `rank` sequences of coordinates, one per dimension. E.g. for a 2D
+            NList, both [(0, 1), (2, 3)] and ([0, 2], [1, 3]) select the
+            elements at (0, 1) and (2, 3).
+        :raises IndexError: If any of the indexes is out of range.
+        :rtype: list
+
+        The whole batch is validated before any element is accessed.
+        """
+        offsets = self._batch_to_flat(indexes)
+        return list(map(self._data.__getitem__, offsets))
+
+    def put(self, indexes, values):
+        """Sets the elements at `indexes` to the corresponding `values`.
+
+        :param indexes: Index tuples in either form accepted by :meth:`take`.
+        :param values: A sequence of values, one for each index.
+        :raises IndexError: If any of the indexes is out of range.
+        :raises ValueError: If the numbers of indexes and values differ.
+        :raises TypeError: If a value cannot be stored in a typed NList.
+
+        The whole batch is validated before any element is changed.
+        """
+        offsets = self._batch_to_flat(indexes)
+        values = self._make_storage(values)
+        if len(values) != len(offsets):
+            raise ValueError(
+                'Got %s values for %s indexes' % (len(values), len(offsets))
+            )
+        # Exhaust the map at C speed without building a list of Nones
+        deque(map(self._data.__setitem__, offsets, values), maxlen=0)
+
+    def _batch_to_flat(self, indexes):
+        if isinstance(indexes, tuple):
+            columns = [list(column) for column in indexes]
+            if len(columns) != self.rank:
+                raise TypeError('NList index must be rank %s' % self.rank)
+            if len({len(column) for column in columns}) > 1:
+                raise ValueError('Coordinate sequences must have equal lengths')
+            count = len(columns[0]) if columns else 1
+        else:
+            rows = list(indexes)
+            if not all(map(isinstance, rows, repeat(tuple))):
+                raise TypeError('NList index must be a tuple')
+            if any(len(row) != self.rank for row in rows):
+                raise TypeError('NList index must be rank %s' % self.rank)
+            columns = [list(column) for column in zip(*rows)]
+            count = len(rows)
+
+        offsets = [self._offset] * count
+        for column, dim, stride in zip(columns, self._shape, self._strides):
+            if not all(map(isinstance, column, repeat(int))):
+                raise TypeError('Indexes must consist of integers')
+            if column and not (0 <= min(column) and max(column) < dim):
+                raise IndexError('NList index out of range')
+            offsets = list(map(
+                operator.add, offsets, map(operator.mul, column, repeat(stride))
+            ))
+        return offsets
+
+    def neighbourhoods(self, offsets=1, boundary='clip', fill=None):
+        """Returns an iterable of pairs (index, values) for all indexes of the
+        NList in iteration order, where values is a list of the elements at
+        index plus each of `offsets`.
+
+        :param offsets: Either a sequence of index offsets, or a radius:
+            an integer r standing for all offsets with every component
+            between -r and r, the zero offset included.
+        :param str boundary: How neighbours beyond the edges are read:
+            'clip' uses the nearest element on the edge, 'wrap' wraps around
+            to the opposite edge, and 'constant' uses `fill`.
+        :param fill: The value of neighbours beyond the edges for the
+            'constant' boundary.
+        :raises ValueError: If `offsets` or `boundary` is invalid.
+
+        Flat storage offsets of the neighbours are computed once, so that
+        cells farther from the edges than the offsets reach are read without
+        any bounds checks. Only the cells near the edges go through `boundary`.
+        """
+        if isinstance(offsets, int):
+            if offsets < 0:
+                raise ValueError('Radius must be non-negative')
+            offsets = itertools.product(range(-offsets, offsets + 1), repeat=self._rank)
+        offsets = [tuple(x) for x in offsets]
+        if any(len(x) != self._rank for x in offsets):
+            raise ValueError('Offsets must be rank %s' % self._rank)
+        if boundary not in ('clip', 'wrap', 'constant'):
+            raise ValueError('Unknown boundary %r' % (boundary,))
+        return self._neighbourhoods(offsets, boundary, fill)
+
+    def _neighbourhoods(self, offsets, boundary, fill):
+        if self._size == 0:
+            return
+        if self._rank == 0:
+            yield (), [self._data[self._offset]] * len(offsets)
+            return
+
+        data, shape, strides = self._data, self._shape, self._strides
+        deltas = [sum(map(operator.mul, x, strides)) for x in offsets]
+        # Cells with indexes between lows and highs have all their
+        # neighbours inside the NList
+        lows = [max([0] + [-x[k] for x in offsets]) for k in range(self._rank)]
+        highs = [
+            dim - max([0] + [x[k] for x in offsets])
+            for k, dim in enumerate(shape)
+        ]
+
+        dim, step = shape[-1], strides[-1]
+        outer_keys = itertools.product(*map(range, shape[:-1]))
+        for outer in outer_keys:
+            start = self._offset + sum(map(operator.mul, outer, strides))
+            inside = all(map(operator.le, lows, outer)) and all(map(operator.lt, outer, highs))
+            for x in range(dim):
+                index = outer + (x,)
+                if inside and lows[-1] <= x < highs[-1]:
+                    base = start + x * step
+                    yield index, [data[base + delta] for delta in deltas]
+                else:
+                    yield index, self._border_values(index, offsets, boundary, fill)
+
+    def _border_values(self, index, offsets, boundary, fill):
+        values = []
+        for offset in offsets:
+            neighbour = tuple(map(operator.add, index, offset))
+            if boundary == 'wrap':
+                neighbour = tuple(map(operator.mod, neighbour, self._shape))
+            elif boundary == 'clip':
+                neighbour = tuple(
+                    min(max(x, 0), dim - 1) for x, dim in zip(neighbour, self._shape)
+                )
+            elif not self._in_bounds(neighbour):
+                values.append(fill)
+                continue
+            values.append(self._data[self._unchecked_flat_index(self, neighbour)])
+        return values
+
+    def convolve(self, kernel, boundary='constant', fill=0):
+        """Returns the convolution of the NList with `kernel`.
+
+        Element i of the result is the sum of ``kernel[k] * self[i - k + c]``
+        over all indexes k of the kernel, where c is the kernel's centre: the
+        index with every component equal to half the kernel's dimension,
+        rounded down. A symmetric kernel is thus applied as it is written.
+
+        :param kernel: An NList or a nested sequence of the same rank as the
+            NList.
+        :param str boundary: How elements beyond the edges are read,
+            see :meth:`neighbourhoods`. By default they are `fill`.
+        :param fill: The value of elements beyond the edges for the
+            'constant' boundary.
+        :raises ValueError: If the kernel has a different rank.
+        :rtype: NList
+        """
+        if not isinstance(kernel, NList):
+            kernel = NList(kernel)
+        if kernel.rank != self._rank:
+            raise ValueError(
+                'Kernel must be rank %s, not %s' % (self._rank, kernel.rank)
+            )
+        centre = [dim // 2 for dim in kernel.shape]
+        offsets = [
+            tuple(map(operator.sub, centre, index)) for index in kernel.keys()
+        ]
+        weights = list(kernel._values())
+        results = [
+            sum(map(operator.mul, weights, values))
+            for _, values in self.neighbourhoods(offsets, boundary, fill)
+        ]
+        return type(self)._from_flat(results, self._shape)
+
+    @classmethod
+    @contextmanager
+    def profile(cls, heatmap=None):
+        """A context manager that collects statistics on NList usage.
+
+        While it is active, calls to :meth:`__getitem__`,
+        :meth:`__setitem__`, :meth:`keys`, :meth:`index` and
+        :meth:`to_nested` of all NLists are counted and timed, including
+        the iteration over the keys returned by :meth:`keys`. Results are
+        available from :meth:`stats` until the next profiling starts.
+        Outside of it, the methods run without any overhead.
+
+        :param int heatmap: If given, NLists also count accesses to their
+            elements by region, splitting every dimension into up to
+            `heatmap` parts. See :meth:`access_heatmap`.
+        :raises RuntimeError: If profiling is already active.
+
+        Example:
+        ::
+
+            with NList.profile(heatmap=4):
+                run_simulation(grid)
+            print(NList.stats()['__getitem__'])
+            print(grid.access_heatmap())
+        """
+        if NList._profiling:
+            raise RuntimeError('NList profiling is already active')
+        NList._profiling = True
+        NList._profile_counters = {name: [0, 0.0] for name in PROFILED_METHODS}
+        NList._heatmaps = {}
+        originals = {name: NList.__dict__[name] for name in PROFILED_METHODS}
+        for name, method in originals.items():
+            track_access = name in ('__getitem__', '__setitem__')
+            setattr(NList, name, profiled(
+                method, NList._profile_counters[name],
+                heatmap if track_access else None,
+                name in ITERATOR_METHODS
+            ))
+        try:
+            yield
+        finally:
+            for name, method in originals.items():
+                setattr(NList, name, method)
+            NList._profiling = False
+
+    @classmethod
+    def stats(cls):
+        """Returns statistics collected by the current or the last
+        :meth:`profile` block: a dict mapping names of the profiled methods
+        to dicts with the number of 'calls' and the total 'time' in seconds.
+        """
+        return {
+            name: {'calls': calls, 'time': seconds}
+            for name, (calls, seconds) in NList._profile_counters.items()
+        }
+
+    def access_heatmap(self):
+        """Returns an NList with counts of accesses to elements of this
+        NList by region, recorded by the current or the last :meth:`profile`
+        block with `heatmap` set, or None if no accesses were recorded.
+
+        An element with index ``(i, j, ...)`` of an NList of shape
+        ``(n, m, ...)`` falls into the region with index
+        ``(i * a // n, j * b // m, ...)`` of the heatmap of shape
+        ``(a, b, ...)``.
+
+        :rtype: NList
+        """
+        entry = NList._heatmaps.get(id(self))
+        if entry is None or entry[0]() is not self:
+            return None
+        _, shape, counts = entry
+        data = [0] * product(shape)
+        strides = contiguous_strides(shape)
+        for region, count in counts.items():
+            data[sum(map(operator.mul, region, strides))] = count
+        return type(self)._from_flat(data, shape)
+
+    def _record_access(self, key, heatmap):
+        if (type(key) is not tuple or len(key) != self._rank or
+                any(not isinstance(x, int) for x in key) or
+                not self._in_bounds(key)):
+            return
+        entry = NList._heatmaps.get(id(self))
+        if entry is None or entry[0]() is not self:
+            regions = tuple(min(heatmap, dim) for dim in self._shape)
+            entry = NList._heatmaps[id(self)] = (weakref.ref(self), regions, {})
+        _, regions, counts = entry
+        region = tuple(
+            x * parts // dim
+            for x, parts, dim in zip(key, regions, self._shape)
+        )
+        counts[region] = counts.get(region, 0) + 1
+
+    def to_nested(self):
+        """Returns the NList's elements as nested lists.
+
+        E.g. a 2x3 NList is converted to a list of two lists of three
+        elements each. A zero-dimensional NList returns its only element.
+        """
+        if self._rank == 0:
+            return self._data[self._offset]
+
+        nested = list(self._values())
+        for axis in range(self._rank - 1, 0, -1):
+            dim, groups = self._shape[axis], product(self._shape[:axis])
+            nested = [nested[k * dim:(k + 1) * dim] for k in range(groups)]
+        return nested
+
+    def _nested_repr(self, axis, offset, edgeitems):
+        dim, stride = self._shape[axis], self._strides[axis]
+        if edgeitems is not None and dim > 2 * edgeitems:
+            positions = itertools.chain(
+                range(edgeitems), (None,), range(dim - edgeitems, dim)
+            )
+        else:
+            positions = range(dim)
+
+        parts = []
+        for k in positions:
+            if k is None:
+                parts.append('...')
+            elif axis == self._rank - 1:
+                parts.append(repr(self._data[offset + k * stride]))
+            else:
+                parts.append(
+                    self._nested_repr(axis + 1, offset + k * stride, edgeitems)
+                )
+        return '[%s]' % ', '.join(parts)
+
+    def _owns_data(self):
+        return (
+            self._contiguous and
+            self._offset == 0 and
+            len(self._data) == self.size
+        )
+
+    def _values(self):
+        if self._owns_data():
+            return self._data
+        if self._contiguous:
+            return self._data[self._offset:self._offset + self.size]
+        return itertools.chain.from_iterable(self._run_values())
+
+    def _run_values(self):
+        """Yields the elements of every innermost row of the NList."""
+        if self._rank and self._strides[-1] == 0:
+            length = self._shape[-1]
+            return (repeat(self._data[run.start], length) for run in self._runs())
+        return (self._data[run] for run in self._runs())
+
+    def _runs(self):
+        """Yields a slice of `_data` for every innermost row of the NList."""
         if self.size == 0:
-            return []
+            return
+        if self.rank == 0:
+            yield slice(self._offset, self._offset + 1)
+            return
+
+        length, step = self._shape[-1], self._strides[-1]
+        outer = [
+            range(0, dim * stride, stride) if stride else (0,) * dim
+            for dim, stride in zip(self._shape[:-1], self._strides[:-1])
+        ]
+        for parts in itertools.product(*outer):
+            start = self._offset + sum(parts)
+            stop = start + length * step
+            if step < 0 and stop < 0:
+                stop = None
+            yield slice(start, stop, step)
+
+    def _view(self, key):
+        if len(key) != self.rank:
+            raise TypeError('NList index must be rank %s' % self.rank)
+
+        shape, strides, offset = [], [], self._offset
+        for x, dim, stride in zip(key, self._shape, self._strides):
+            if isinstance(x, slice):
+                start, stop, step = x.indices(dim)
+                shape.append(len(range(start, stop, step)))
+                strides.append(stride * step)
+                offset += start * stride
+            elif isinstance(x, int):
+                if not 0 <= x < dim:
+                    raise IndexError('NList index out of range')
+                offset += x * stride
+            else:
+                raise TypeError('Indexes must consist of integers or slices')
+        return self._make_view(tuple(shape), tuple(strides), offset)
+
+    @staticmethod
+    def _assign_view(view, value):
+        if isinstance(value, NList):
+            if value.shape != view.shape:
+                raise ValueError(
+                    'Cannot assign NList of shape %s to a region of shape %s'
+                    % (value.shape, view.shape)
+                )
+            values = list(value._values())
+        else:
+            values = itertools.repeat(value)
 
-        nested = self._data
-        for dim in reversed(self.shape[1:]):
-            nested = group_every_n(nested, dim)
-        return list(nested)
+        data, length = view._data, view._shape[-1]
+        values = iter(values)
+        for run in view._runs():
+            data[run] = view._make_storage(islice(values, length))
 
     def _check_index(self, index):
         if not isinstance(index, tuple):
@@ -249,10 +2469,6 @@ class NList:
                 return False
         return True
 
-    def _index_to_flat(self, index):
-        self._check_index(index)
-        return sum(self._strides[k] * index[k] for k in range(self.rank))
-
     @staticmethod
     def _check_shape(shape):
         for x in shape:
@@ -261,5 +2477,272 @@ class NList:
             if x < 0:
                 raise ValueError('Dimensions cannot be negative')
 
+
+
+class FrozenNList(NList):
+    """An immutable NList that can be hashed, e.g. to be used as a dict key
+    or as an argument of a function memoized with :func:`functools.lru_cache`.
+
+    Accepts the same `other`, `shape` and `default` arguments as
+    :class:`NList`. The elements are stored in a tuple, and the hash is
+    computed on first use and cached. FrozenNLists with different cached
+    hashes compare unequal without comparing their elements.
+
+    Views and the results of elementwise operations on a FrozenNList are
+    FrozenNLists too. Use :meth:`thaw` to get a mutable copy.
+    """
+
+    def __init__(self, other=None, shape=None, default=None):
+        super().__init__(other, shape, default)
+        self._dtype = None
+        if type(self._data) is not tuple:
+            self._data = tuple(self._data)
+
+    @classmethod
+    def _from_flat(cls, data, shape, dtype=None):
+        return super()._from_flat(tuple(data), shape)
+
+    def _init_layout(self):
+        super()._init_layout()
+        self._hash = None
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash((self._shape, tuple(self._values())))
+        return self._hash
+
+    def __eq__(self, other):
+        if (isinstance(other, FrozenNList) and self._hash is not None and
+                other._hash is not None and self._hash != other._hash):
+            return False
+        return super().__eq__(other)
+
+    def __repr__(self):
+        return 'Frozen' + super().__repr__()
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('FrozenNList is immutable')
+
+    __setitem__ = set_unchecked = put = restore = _immutable
+    append = extend = resize = _immutable
+
+    def copy(self):
+        """Returns the FrozenNList itself, as it cannot change."""
+        return self
+
+    def freeze(self):
+        """Returns the FrozenNList itself."""
+        return self
+
+    def thaw(self):
+        """Returns a mutable copy of the FrozenNList.
+
+        :rtype: NList
+        """
+        return NList(self)
+
+
+class LazyNList:
+    """An elementwise expression over NLists that is only evaluated when
+    its elements are requested. Created by :meth:`NList.lazy`.
+
+    Arithmetic operators, ordering comparisons and :meth:`map` work as for
+    :class:`NList`, but record the operation instead of performing it.
+    :meth:`compute` then evaluates the whole expression in a single pass,
+    without building intermediate NLists. Indexing an expression evaluates
+    only the requested element, and slicing it returns an expression over
+    the selected region only.
+    Example:
+    ::
+
+        result = ((a.lazy() * 2 + b) > c)[10:20, :].compute()
+    """
+    def __init__(self, shape, func=None, operands=(), source=None, thunk=None):
+        self._shape = shape
+        self._func = func
+        self._operands = operands
+        self._source = source
+        self._thunk = thunk
+
+    @classmethod
+    def _leaf(cls, source):
+        return cls(source.shape, source=source)
+
+    @property
+    def shape(self):
+        """A tuple with the expression's dimensions. Read-only."""
+        return self._shape
+
+    @property
+    def rank(self):
+        """Number of the expression's dimensions. Read-only."""
+        return len(self._shape)
+
+    @property
+    def size(self):
+        """Number of elements in the expression. Read-only."""
+        return product(self._shape)
+
+    def __repr__(self):
+        return 'LazyNList(shape=%s)' % (self._shape,)
+
+    def lazy(self):
+        """Returns the expression itself."""
+        return self
+
+    def compute(self):
+        """Evaluates the expression.
+
+        :rtype: NList
+        """
+        return NList._from_flat(list(self._iterate(self._shape)), self._shape)
+
+    def map(self, func, *others):
+        """Records applying `func` elementwise, see :meth:`NList.map`.
+
+        :rtype: LazyNList
+        """
+        operands = tuple(
+            LazyNList._leaf(x) if isinstance(x, NList) else x
+            for x in (self,) + others
+        )
+        shape = broadcast_shapes(
+            *(x.shape for x in operands if isinstance(x, LazyNList))
+        )
+        return LazyNList(shape, func, operands)
+
+    __add__ = elementwise(operator.add)
+    __sub__ = elementwise(operator.sub)
+    __mul__ = elementwise(operator.mul)
+    __truediv__ = elementwise(operator.truediv)
+    __floordiv__ = elementwise(operator.floordiv)
+    __mod__ = elementwise(operator.mod)
+    __pow__ = elementwise(operator.pow)
+    __radd__ = reflected(operator.add)
+    __rsub__ = reflected(operator.sub)
+    __rmul__ = reflected(operator.mul)
+    __rtruediv__ = reflected(operator.truediv)
+    __rfloordiv__ = reflected(operator.floordiv)
+    __rmod__ = reflected(operator.mod)
+    __rpow__ = reflected(operator.pow)
+    __lt__ = elementwise(operator.lt)
+    __le__ = elementwise(operator.le)
+    __gt__ = elementwise(operator.gt)
+    __ge__ = elementwise(operator.ge)
+
+    def __neg__(self):
+        return self.map(operator.neg)
+
+    def __pos__(self):
+        return self.map(operator.pos)
+
+    def __abs__(self):
+        return self.map(abs)
+
+    def __getitem__(self, key):
+        """Evaluates a single element if `key` is an index, or returns an
+        expression over a region if `key` contains slices.
+        """
+        selected = self._select(self._shape, key)
+        if has_slices(key):
+            return selected
+        return selected.compute()[()]
+
+    def reduce(self, func, axis=None, initial=missing):
+        """Records a reduction, see :meth:`NList.reduce`.
+
+        A reduction of all elements (with `axis` None) is evaluated right
+        away and returns a value; a reduction along an axis returns
+        an expression.
+        """
+        if initial is missing:
+            return self._aggregate(lambda xs: reduce(func, xs), axis)
+        return self._aggregate(lambda xs: reduce(func, xs, initial), axis)
+
+    def sum(self, axis=None, start=0):
+        """Records a sum, see :meth:`NList.sum` and :meth:`reduce`."""
+        return self._aggregate(lambda xs: sum(xs, start), axis)
+
+    def min(self, axis=None):
+        """Records a minimum, see :meth:`NList.min` and :meth:`reduce`."""
+        return self._aggregate(min, axis)
+
+    def max(self, axis=None):
+        """Records a maximum, see :meth:`NList.max` and :meth:`reduce`."""
+        return self._aggregate(max, axis)
+
+    def any(self, axis=None):
+        """Records an any() check, see :meth:`NList.any` and :meth:`reduce`."""
+        return self._aggregate(any, axis)
+
+    def all(self, axis=None):
+        """Records an all() check, see :meth:`NList.all` and :meth:`reduce`."""
+        return self._aggregate(all, axis)
+
+    def _aggregate(self, func, axis):
+        if axis is None:
+            return func(self._iterate(self._shape))
+        if not isinstance(axis, int):
+            raise TypeError('Axis must be an integer')
+        if not 0 <= axis < self.rank:
+            raise ValueError('Axis %s is out of range for rank %s' % (axis, self.rank))
+
+        shape = self._shape[:axis] + self._shape[axis + 1:]
+        length = self._shape[axis]
+
+        def evaluate():
+            if length == 0:
+                groups = repeat((), product(shape))
+            else:
+                # Evaluate with `axis` moved to the end, so that every
+                # `length` consecutive values form a group
+                axes = tuple(k for k in range(self.rank) if k != axis) + (axis,)
+                values = self._iterate(self._shape, axes)
+                groups = zip(*[values] * length)
+            return NList._from_flat(list(map(func, groups)), shape)
+
+        return LazyNList(shape, thunk=evaluate)
+
+    def _leaf_source(self):
+        if self._source is None:
+            self._source = self._thunk()
+        return self._source
+
+    def _iterate(self, shape, axes=None):
+        """Returns an iterator of the expression's values broadcast to
+        `shape`, with dimensions permuted by `axes` if it is given.
+        """
+        if self._func is None:
+            source = self._leaf_source()._broadcast_to(shape)
+            if axes is not None:
+                source = source.transpose(*axes)
+            return iter(source._values())
+        columns = [
+            x._iterate(shape, axes) if isinstance(x, LazyNList) else repeat(x)
+            for x in self._operands
+        ]
+        return map(self._func, *columns)
+
+    def _select(self, shape, key):
+        """Returns the expression with `key` applied to its leaves broadcast
+        to `shape`.
+        """
+        if self._func is None:
+            source = self._leaf_source()._broadcast_to(shape)
+            selected = source[key]
+            if not isinstance(selected, NList):
+                selected = type(source)._from_flat([selected], ())
+            return LazyNList._leaf(selected)
+
+        operands = tuple(
+            x._select(shape, key) if isinstance(x, LazyNList) else x
+            for x in self._operands
+        )
+        selected_shape = next(
+            x.shape for x in operands if isinstance(x, LazyNList)
+        )
+        return LazyNList(selected_shape, self._func, operands)
+
+
 Container.register(NList)
 Iterable.register(NList)
@@ -1,6 +1,13 @@
 import pytest
+import array
+import asyncio
 import collections.abc
-from nlist import NList
+import io
+import operator
+import pickle
+import threading
+import time
+from nlist import NList, FrozenNList, LazyNList
 
 
 def test_init():
@@ -330,3 +337,1209 @@ def test_index():
         NList().index(None, stop=())
     with pytest.raises(ValueError):
         NList().index(None, start=(), stop=())
+
+def test_slicing():
+    l = NList([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]])
+    assert l[1, :] == NList([5, 6, 7, 8])
+    assert l[:, 2] == NList([3, 7, 11])
+    assert l[0:2, 1:3] == NList([[2, 3], [6, 7]])
+    assert l[::2, ::-2] == NList([[4, 2], [12, 10]])
+    assert l[1:1, :].shape == (0, 4)
+    assert l[:, :] == l
+    assert l[1:, 1:][1, 2] == 12
+    assert l[::-1, :][::-1, ::-1] == l[:, ::-1]
+
+    block = l[1:3, ::2]
+    assert block.shape == (2, 2)
+    assert list(block) == [5, 7, 9, 11]
+    assert block.count(7) == 1
+    assert repr(block) == 'NList([[5, 7], [9, 11]], shape=(2, 2))'
+    assert list(block.keys()) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+    assert block.index(9) == (1, 0)
+
+    block[0, 1] = 42
+    assert l[1, 2] == 42
+    copied = block.copy()
+    copied[0, 0] = 0
+    assert l[1, 0] == 5
+    assert copied == NList([[0, 42], [9, 11]])
+
+    with pytest.raises(IndexError):
+        l[3, :]
+    with pytest.raises(TypeError):
+        l[:]
+    with pytest.raises(TypeError):
+        l['wat', :]
+
+def test_slice_assignment():
+    l = NList(shape=(3, 4), default=0)
+    l[1, :] = 7
+    assert list(l) == [0, 0, 0, 0, 7, 7, 7, 7, 0, 0, 0, 0]
+    l[:, ::-3] = NList([[1, 2], [3, 4], [5, 6]])
+    assert l == NList([[2, 0, 0, 1], [4, 7, 7, 3], [6, 0, 0, 5]])
+
+    with pytest.raises(ValueError):
+        l[:, 0] = NList([1, 2])
+
+def test_dtype():
+    l = NList(shape=(2, 3), dtype='d')
+    assert l.dtype == 'd'
+    assert NList().dtype is None
+    assert l[1, 2] == 0.0
+    l[0, 1] = 2.5
+    assert l[0, 1] == 2.5
+    assert list(l) == [0.0, 2.5, 0.0, 0.0, 0.0, 0.0]
+    assert l.count(0.0) == 5
+    assert l.index(2.5) == (0, 1)
+    assert repr(l) == "NList([[0.0, 2.5, 0.0], [0.0, 0.0, 0.0]], shape=(2, 3), dtype='d')"
+
+    l2 = l.copy()
+    assert l2.dtype == 'd'
+    assert l2 == l
+    l2[0, 0] = 1
+    assert l2 != l
+    assert l[0, 0] == 0
+
+    assert NList(shape=(2,), default=7, dtype='i') == NList([7, 7])
+    assert NList([[1, 2], [3, 4]], dtype='b')[1, 0] == 3
+    assert NList(NList([1, 2]), dtype='i').dtype == 'i'
+    assert NList(NList([[1, 2], [3, 4]], dtype='i')[:, 1]) == NList([2, 4])
+
+    with pytest.raises(TypeError):
+        l[0, 0] = 'wat'
+    with pytest.raises(OverflowError):
+        NList(shape=(2,), dtype='b')[0,] = 1000
+    with pytest.raises(ValueError):
+        NList(shape=(2,), dtype='wat')
+
+def test_take_put():
+    l = NList([[1, 2, 3], [4, 5, 6]])
+    assert l.take([(0, 1), (1, 2), (0, 1)]) == [2, 6, 2]
+    assert l.take(([0, 1, 0], [1, 2, 1])) == [2, 6, 2]
+    assert l.take([]) == []
+    assert l[:, ::-1].take([(0, 0), (1, 2)]) == [3, 4]
+    assert NList(default=42).take([(), ()]) == [42, 42]
+    assert NList(default=42).take(()) == [42]
+
+    l.put([(0, 0), (1, 1)], ['a', 'b'])
+    assert l == NList([['a', 2, 3], [4, 'b', 6]])
+    l.put(([1, 1], range(2)), 'xy')
+    assert l == NList([['a', 2, 3], ['x', 'y', 6]])
+
+    with pytest.raises(IndexError):
+        l.take([(0, 0), (2, 0)])
+    with pytest.raises(IndexError):
+        l.take(([0, 0], [0, -1]))
+    with pytest.raises(IndexError):
+        l.put([(0, 0), (0, 3)], [7, 7])
+    assert l[0, 0] == 'a'
+    with pytest.raises(TypeError):
+        l.take([(0, 0), (0,)])
+    with pytest.raises(TypeError):
+        l.take([[0, 0]])
+    with pytest.raises(TypeError):
+        l.take(([0], [0], [0]))
+    with pytest.raises(TypeError):
+        l.take([(0, 'wat')])
+    with pytest.raises(ValueError):
+        l.take(([0, 1], [0]))
+    with pytest.raises(ValueError):
+        l.put([(0, 0)], [1, 2])
+
+    typed = NList([1.0, 2.0], dtype='d')
+    with pytest.raises(TypeError):
+        typed.put([(0,), (1,)], [9.0, 'x'])
+    assert typed == NList([1.0, 2.0])
+
+def test_unchecked():
+    l = NList(shape=(2, 3, 4, 5), default=0)
+    l.set_unchecked((1, 2, 3, 4), 42)
+    assert l[1, 2, 3, 4] == l.get_unchecked((1, 2, 3, 4)) == 42
+
+    for shape in [(), (3,), (2, 3), (2, 3, 4)]:
+        l = NList(shape=shape, default=0)
+        for i, key in enumerate(l.keys()):
+            l.set_unchecked(key, i)
+        assert list(l) == list(range(l.size))
+        assert [l.get_unchecked(key) for key in l.keys()] == list(l)
+
+    view = NList([[1, 2, 3], [4, 5, 6]])[::-1, 1:]
+    assert view.get_unchecked((0, 1)) == 6
+    view.set_unchecked((1, 0), 7)
+    assert view[1, 0] == 7
+
+def test_to_nested():
+    assert NList().to_nested() is None
+    assert NList([1, 2, 3]).to_nested() == [1, 2, 3]
+    assert NList([[1, 2, 3], [4, 5, 6]]).to_nested() == [[1, 2, 3], [4, 5, 6]]
+    assert NList(shape=(2, 0)).to_nested() == [[], []]
+    assert NList(shape=(0, 2)).to_nested() == []
+    assert NList(shape=(2, 0, 3)).to_nested() == [[], []]
+    assert NList([[1, 2, 3], [4, 5, 6]])[:, ::-2].to_nested() == [[3, 1], [6, 4]]
+
+    nested = [[[1, 2, 3], [4, 5, 6]], [[7, 8, 9], [10, 11, 12]]]
+    assert NList(nested).to_nested() == nested
+    assert NList(NList(nested).to_nested()) == NList(nested)
+
+def test_summarised_repr():
+    l = NList(shape=(10, 2000), default=0)
+    assert repr(l) == (
+        'NList([[0, 0, 0, ..., 0, 0, 0], [0, 0, 0, ..., 0, 0, 0], '
+        '[0, 0, 0, ..., 0, 0, 0], ..., [0, 0, 0, ..., 0, 0, 0], '
+        '[0, 0, 0, ..., 0, 0, 0], [0, 0, 0, ..., 0, 0, 0]], shape=(10, 2000))'
+    )
+    assert repr(NList(list(range(1001)))) == (
+        'NList([0, 1, 2, ..., 998, 999, 1000], shape=(1001,))'
+    )
+    assert repr(NList(list(range(1000)))).count('...') == 0
+
+    class Options(NList):
+        repr_threshold = 5
+        repr_edgeitems = 1
+    l = Options([[1, 2, 3], [4, 5, 6]])
+    assert repr(l) == 'NList([[1, ..., 3], [4, ..., 6]], shape=(2, 3))'
+
+def test_map():
+    a = NList([[1, 2, 3], [4, 5, 6]])
+    assert a.map(float) == NList([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+    assert a.map(lambda x, y: x * y, a) == NList([[1, 4, 9], [16, 25, 36]])
+    assert a.map(max, 3) == NList([[3, 3, 3], [4, 5, 6]])
+    assert a.map(lambda x, y, z: x + y + z, NList([10, 20, 30]), NList([[100], [200]])) == NList([
+        [111, 122, 133], [214, 225, 236]
+    ])
+    assert NList(default=5).map(operator.add, NList([1, 2])) == NList([6, 7])
+    assert a[:, ::-1].map(operator.sub, a[:, 0:1]) == NList([[2, 1, 0], [2, 1, 0]])
+    assert a[0:1, :].map(operator.add, NList(shape=(0, 3))).shape == (0, 3)
+
+    with pytest.raises(ValueError):
+        a.map(operator.add, NList([1, 2]))
+    with pytest.raises(ValueError):
+        a.map(operator.add, NList(shape=(3, 3)))
+
+def test_operators():
+    a = NList([[1, 2, 3], [4, 5, 6]])
+    assert a + 1 == NList([[2, 3, 4], [5, 6, 7]])
+    assert 1 + a == a + 1
+    assert 10 - a == NList([[9, 8, 7], [6, 5, 4]])
+    assert a * 2 + NList([10, 20, 30]) == NList([[12, 24, 36], [18, 30, 42]])
+    assert a / 2 == NList([[0.5, 1.0, 1.5], [2.0, 2.5, 3.0]])
+    assert a // 2 == NList([[0, 1, 1], [2, 2, 3]])
+    assert a % 2 == NList([[1, 0, 1], [0, 1, 0]])
+    assert a ** 2 == a * a
+    assert 2 ** NList([1, 2]) == NList([2, 4])
+    assert -a == a * -1
+    assert +a == a
+    assert abs(-a) == a
+    assert (a > 3) == NList([[False, False, False], [True, True, True]])
+    assert (a <= NList([2, 2, 2])) == NList([[True, True, False], [False, False, False]])
+    assert (a >= 4).count(True) == (a < 4).count(False) == 3
+
+    a[0, 0] = 100
+    assert (a + 0)[0, 0] == 100
+
+def test_reduce():
+    l = NList([[1, 5, 3], [4, 2, 6]])
+    assert l.reduce(operator.add) == 21
+    assert l.reduce(operator.add, initial=100) == 121
+    assert l.reduce(operator.mul, axis=0) == NList([4, 10, 18])
+    assert l.reduce(operator.sub, axis=1, initial=0) == NList([-9, -12])
+    assert l.sum() == 21
+    assert l.sum(axis=0) == NList([5, 7, 9])
+    assert l.sum(axis=1) == NList([9, 12])
+    assert l.sum(axis=1, start=1) == NList([10, 13])
+    assert l.min() == 1
+    assert l.max(axis=0) == NList([4, 5, 6])
+    assert l.min(axis=1) == NList([1, 2])
+    assert (l > 4).any(axis=1) == NList([True, True])
+    assert (l > 1).all(axis=0) == NList([False, True, True])
+    assert l[:, ::-2].max(axis=0) == NList([6, 4])
+    assert NList([1, 2, 3]).sum(axis=0) == NList(default=6)
+
+    l3 = NList([
+        [[1, 2, 3], [4, 5, 6]],
+        [[7, 8, 9], [10, 11, 12]]
+    ])
+    assert l3.sum(axis=0) == NList([[8, 10, 12], [14, 16, 18]])
+    assert l3.sum(axis=1) == NList([[5, 7, 9], [17, 19, 21]])
+    assert l3.sum(axis=2) == NList([[6, 15], [24, 33]])
+
+    empty = NList(shape=(2, 0))
+    assert empty.sum(axis=1) == NList([0, 0])
+    assert empty.sum(axis=0) == NList(shape=(0,))
+    assert empty.max(axis=1, default=None) == NList([None, None])
+    with pytest.raises(ValueError):
+        empty.max(axis=1)
+    with pytest.raises(TypeError):
+        empty.reduce(operator.add)
+
+    with pytest.raises(ValueError):
+        l.sum(axis=2)
+    with pytest.raises(ValueError):
+        l.sum(axis=-1)
+    with pytest.raises(TypeError):
+        l.sum(axis='wat')
+
+def test_flat_keys():
+    l = NList([[1, 2, 3], [4, 5, 6]])
+    assert l.flat_keys() == range(6)
+    assert l.flat_keys(start=(0, 2)) == range(2, 6)
+    assert l.flat_keys(start=(0, 2), stop=(1, 1)) == range(2, 4)
+    assert l.flat_keys(start=(1, 1), stop=(0, 0)) == range(4, 4)
+    assert NList().flat_keys() == range(1)
+    assert NList(shape=(3, 0)).flat_keys() == range(0)
+    with pytest.raises(IndexError):
+        l.flat_keys(start=(2, 0))
+
+def test_items():
+    l = NList([[1, 2, 3], [4, 5, 6]])
+    assert list(l.items()) == list(l.enumerate())
+    assert list(l.items(start=(0, 2), stop=(1, 2))) == [
+        ((0, 2), 3), ((1, 0), 4), ((1, 1), 5)
+    ]
+    assert list(l.items(stop=(0, 0))) == []
+    assert list(l[::-1, 1:].items(start=(0, 1))) == [
+        ((0, 1), 6), ((1, 0), 2), ((1, 1), 3)
+    ]
+    assert list(NList(default=1).items(start=())) == [((), 1)]
+
+    l3 = NList(shape=(3, 4, 5))
+    keys = list(l3.keys())
+    for start in [(0, 0, 1), (0, 3, 4), (1, 0, 0), (2, 3, 4)]:
+        for stop in [None, (1, 2, 3), (2, 3, 4)]:
+            expected = [
+                key for key in keys
+                if key >= start and (stop is None or key < stop)
+            ]
+            assert list(l3.keys(start, stop)) == expected
+
+def test_index_typed_and_views():
+    l = NList([[1, 5, 8], [4, 5, 6]], dtype='i')
+    assert l.index(5) == (0, 1)
+    assert l.index(5, start=(0, 2)) == (1, 1)
+    with pytest.raises(ValueError):
+        l.index(5, start=(0, 2), stop=(1, 1))
+    assert l[:, ::-1].index(5, start=(0, 2)) == (1, 1)
+    assert l[:, 1:].index(6) == (1, 1)
+    l = NList(shape=(1,), default=(1, 2))
+    assert l.index((1, 2)) == (0,)
+    with pytest.raises(ValueError):
+        l.index((3, 4))
+
+def test_find_all_argwhere():
+    l = NList([[1, 5, 8], [4, 5, 6]])
+    assert l.find_all(5) == [(0, 1), (1, 1)]
+    assert l.find_all(7) == []
+    assert l[::-1, :].find_all(5) == [(0, 1), (1, 1)]
+    assert l.argwhere(lambda x: x % 2 == 0) == [(0, 2), (1, 0), (1, 2)]
+    assert NList().find_all(None) == [()]
+
+def test_value_index():
+    l = NList([[1, 5, 8], [4, 5, 6]]).with_value_index()
+    assert l == NList([[1, 5, 8], [4, 5, 6]])
+    assert l.count(5) == 2
+    assert l.index(5) == (0, 1)
+    assert l.index(5, start=(0, 2)) == (1, 1)
+    assert 8 in l
+    assert 9 not in l
+
+    l[0, 1] = 9
+    assert l.count(5) == 1
+    assert l.index(5) == (1, 1)
+    assert 9 in l
+    l[1, :] = 9
+    assert l.find_all(9) == [(0, 1), (1, 0), (1, 1), (1, 2)]
+    assert 5 not in l
+    view = l[:, 2]
+    view[0,] = 7
+    assert l.find_all(7) == [(0, 2)]
+    l.put([(0, 0), (1, 0)], [7, 7])
+    assert l.count(7) == 3
+    assert l.copy().count(7) == 3
+
+    with pytest.raises(ValueError):
+        l.index(5)
+    with pytest.raises(ValueError):
+        NList(shape=(2,), dtype='d').with_value_index()
+
+    indexed = NList([1, 2]).with_value_index()
+    assert [1] not in indexed
+    with pytest.raises(TypeError):
+        indexed[0,] = [1]
+    with pytest.raises(TypeError):
+        indexed[:] = NList([3, [4]])
+    assert indexed == NList([1, 2]) and indexed.find_all(1) == [(0,)]
+    indexed[0,] = 5
+    assert indexed.index(5) == (0,)
+    assert indexed.count([1]) == 0
+    assert indexed.find_all([1]) == []
+    with pytest.raises(ValueError):
+        indexed.index([1])
+
+def test_sparse():
+    l = NList(shape=(100000, 100000), sparse=True)
+    assert l.sparse
+    assert not NList().sparse
+    assert l.size == 10 ** 10
+    assert l[5, 7] is None
+    l[5, 7] = 'x'
+    l[0, 3] = 'y'
+    assert l[5, 7] == 'x'
+    assert list(l.nonzero_items()) == [((0, 3), 'y'), ((5, 7), 'x')]
+    assert l.index('x') == (5, 7)
+    assert l.index(None) == (0, 0)
+    assert l.index(None, start=(0, 3)) == (0, 4)
+    assert l.count('x') == 1
+    assert l.count(None) == 10 ** 10 - 2
+    assert 'y' in l
+    assert 'z' not in l
+    assert l.find_all('x') == [(5, 7)]
+    l[0, 3] = None
+    assert list(l.nonzero_items()) == [((5, 7), 'x')]
+    assert list(l[5, 6:9].nonzero_items()) == [((1,), 'x')]
+    assert l[5, 6:9] == NList([None, 'x', None])
+
+    with pytest.raises(ValueError):
+        NList().nonzero_items()
+    with pytest.raises(ValueError):
+        NList(shape=(2,), sparse=True, dtype='i')
+
+def test_sparse_conversion():
+    dense = NList([[0, 1, 0], [0, 0, 2]])
+    sparse = NList(dense, default=0, sparse=True)
+    assert sparse.sparse
+    assert sparse == dense
+    assert list(sparse.nonzero_items()) == [((0, 1), 1), ((1, 2), 2)]
+    assert repr(sparse) == repr(dense)
+    assert sparse.sum(axis=1) == NList([1, 2])
+    assert (sparse + 1) == dense + 1
+    assert NList([[0, 1, 0], [0, 0, 2]], default=0, sparse=True) == sparse
+
+    copied = sparse.copy()
+    assert copied.sparse
+    copied[0, 0] = 5
+    assert sparse[0, 0] == 0
+    assert copied != sparse
+
+    back = NList(sparse)
+    assert not back.sparse
+    assert back == dense
+
+    sparse[1, :] = 7
+    assert list(sparse.nonzero_items()) == [
+        ((0, 1), 1), ((1, 0), 7), ((1, 1), 7), ((1, 2), 7)
+    ]
+    sparse.put([(1, 1)], [0])
+    assert sparse.take([(1, 1), (1, 2)]) == [0, 7]
+    assert sparse.count(0) == 3
+
+    # Copies of views keep sparse and chunked storage and its default
+    huge = NList(shape=(100000, 100000), default=0, sparse=True)
+    huge[3, 4] = 1
+    assert NList(huge, sparse=True)._data.default == 0
+    assert NList(huge[:3, :3], sparse=True)._data.default == 0
+    region = huge[0:10, :10].copy()
+    assert region.sparse and region._data.default == 0
+    assert list(region.nonzero_items()) == [((3, 4), 1)]
+    flipped = huge[:10, :10].T.contiguous()
+    assert flipped.sparse and flipped[4, 3] == 1
+
+    chunked = NList(shape=(4, 6), default=0, dtype='i', chunks=(2, 3))
+    chunked[1, 2] = 5
+    for view in (chunked[1, :], chunked.T, chunked[:, ::2]):
+        copied = view.copy()
+        assert copied.chunks is not None and copied == view
+    assert chunked._broadcast_to((2, 4, 6)).copy().chunks == (1, 2, 3)
+
+def test_mmap(tmp_path):
+    path = str(tmp_path / 'grid.bin')
+    l = NList.open_mmap(path, (3, 4), 'd', mode='w+')
+    assert l.shape == (3, 4)
+    assert l.dtype == 'd'
+    assert l.count(0.0) == 12
+    l[1, 2] = 2.5
+    l[2, :] = 1.0
+    l[0, ::-2] = NList([7.0, 8.0])
+    assert l.index(2.5) == (1, 2)
+    assert l.sum() == 21.5
+    l.flush()
+    del l
+
+    l = NList.open_mmap(path, (3, 4), 'd')
+    assert l == NList([
+        [0.0, 8.0, 0.0, 7.0], [0.0, 0.0, 2.5, 0.0], [1.0, 1.0, 1.0, 1.0]
+    ])
+    assert repr(l[1, 1:3]) == "NList([0.0, 2.5], shape=(2,), dtype='d')"
+    with pytest.raises(TypeError):
+        l[0, 0] = 1.0
+
+    copied = l.copy()
+    copied[0, 0] = 3.0
+    assert copied[0, 0] == 3.0
+    assert l[0, 0] == 0.0
+
+    l = NList.open_mmap(path, (3, 4), 'd', mode='r+')
+    l[0, 0] = 4.0
+    del l
+    assert NList.open_mmap(path, (3, 4), 'd')[0, 0] == 4.0
+
+    with pytest.raises(ValueError):
+        NList.open_mmap(path, (3, 5), 'd')
+    with pytest.raises(ValueError):
+        NList.open_mmap(path, (3, 4), 'd', mode='a')
+    with pytest.raises(ValueError):
+        NList.open_mmap(path, (3, 4), 'wat')
+    assert NList.open_mmap(str(tmp_path / 'empty.bin'), (0, 4), 'i', mode='w+').size == 0
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / 'grid.nlist')
+    l = NList([[1.5, 2.0, 3.0], [4.0, 5.0, 6.0]], dtype='d')
+    l.save(path)
+    loaded = NList.load(path)
+    assert loaded == l
+    assert loaded.dtype == 'd'
+    loaded[0, 0] = 0.0
+    assert loaded != l
+
+    f = io.BytesIO()
+    l[:, ::-2].save(f)
+    f.seek(0)
+    assert NList.load(f) == NList([[3.0, 1.5], [6.0, 4.0]])
+
+    for original in [
+        NList([['a', None], [(1, 2), 3]]),
+        NList(default=42),
+        NList(shape=(2, 0, 3), dtype='i'),
+        NList(shape=(1000, 1000), default=0, sparse=True),
+    ]:
+        f = io.BytesIO()
+        original.save(f)
+        f.seek(0)
+        loaded = NList.load(f)
+        assert loaded.shape == original.shape
+        assert loaded.sparse == original.sparse
+        assert loaded == original
+
+    with pytest.raises(ValueError):
+        NList.load(io.BytesIO(b'wat'))
+
+def test_pickle():
+    l = NList([[1, 2, 3], [4, 5, 6]], dtype='i')
+    for protocol in range(2, pickle.HIGHEST_PROTOCOL + 1):
+        loaded = pickle.loads(pickle.dumps(l, protocol))
+        assert loaded == l
+        assert loaded.dtype == 'i'
+        assert type(loaded._data) is array.array
+        loaded[0, 0] = 7
+        assert loaded[0, 0] == 7
+        assert l[0, 0] == 1
+
+        objects = NList([[1, 2.5], [None, 4]]).with_value_index()
+        loaded = pickle.loads(pickle.dumps(objects[:, 1], protocol))
+        assert loaded == NList([2.5, 4])
+
+    if pickle.HIGHEST_PROTOCOL >= 5:
+        buffers = []
+        data = pickle.dumps(l, protocol=5, buffer_callback=buffers.append)
+        assert len(buffers) == 1
+        loaded = pickle.loads(data, buffers=[bytearray(b.raw()) for b in buffers])
+        assert loaded == l
+        loaded[1, 1] = 0
+        assert loaded.sum(axis=1) == NList([6, 10])
+        loaded.append([7, 8, 9])
+        assert loaded.shape == (3, 3)
+
+def test_buffer_export():
+    l = NList([[1.5, 2.0, 3.0], [4.0, 5.0, 6.0]], dtype='d')
+    view = l.as_memoryview()
+    assert view.shape == (2, 3)
+    assert view.strides == (24, 8)
+    assert view.tolist() == l.to_nested()
+    view[1, 2] = 7.0
+    assert l[1, 2] == 7.0
+    assert l[1, :].as_memoryview().tolist() == [4.0, 5.0, 7.0]
+    assert NList(default=3, dtype='i').as_memoryview().tolist() == 3
+
+    interface = l[:, ::-2].__array_interface__
+    assert interface['shape'] == (2, 2)
+    assert interface['typestr'] in ('<f8', '>f8')
+    assert interface['offset'] == 16
+    assert interface['strides'] == (24, -16)
+    assert l.__array_interface__['strides'] is None
+    assert NList(shape=(2,), dtype='B').__array_interface__['typestr'] == '|u1'
+
+    with pytest.raises(TypeError):
+        NList().as_memoryview()
+    with pytest.raises(BufferError):
+        l[:, ::2].as_memoryview()
+    with pytest.raises(BufferError):
+        NList(shape=(2, 0), dtype='d').as_memoryview()
+    assert not hasattr(NList(), '__array_interface__')
+
+def test_from_buffer():
+    data = bytearray(array.array('i', range(6)).tobytes())
+    l = NList.from_buffer(data, (2, 3), 'i')
+    assert l == NList([[0, 1, 2], [3, 4, 5]])
+    l[0, 0] = 42
+    assert array.array('i', bytes(data))[0] == 42
+
+    source = array.array('d', [1.0, 2.0])
+    l = NList.from_buffer(source, (2,))
+    assert l.dtype == 'd'
+    source[1] = 3.0
+    assert l[1,] == 3.0
+
+    with pytest.raises(ValueError):
+        NList.from_buffer(data, (2, 2), 'i')
+
+def test_numpy_interop():
+    # Checked before importing NumPy, so that these run without it
+    with pytest.raises(TypeError):
+        NList([[1, 2], [3, 4]]).to_numpy()
+    with pytest.raises(BufferError):
+        NList(shape=(2, 2), dtype='d', chunks=(1, 1)).to_numpy()
+
+    numpy = pytest.importorskip('numpy')
+    l = NList([[1.5, 2.0, 3.0], [4.0, 5.0, 6.0]], dtype='d')
+    a = l[:, ::-1].to_numpy()
+    assert a.tolist() == [[3.0, 2.0, 1.5], [6.0, 5.0, 4.0]]
+    a[0, 0] = 9.0
+    assert l[0, 2] == 9.0
+    # A view with an offset and negative strides
+    a = numpy.asarray(l[1:, ::-1])
+    assert a.tolist() == [[6.0, 5.0, 4.0]]
+    assert numpy.asarray(l[::-1, 1]).tolist() == [5.0, 2.0]
+
+    a = numpy.arange(6, dtype=numpy.int32).reshape(2, 3)
+    l = NList.from_buffer(a, (2, 3))
+    l[1, 1] = 42
+    assert a[1, 1] == 42
+
+def test_reshape():
+    l = NList([[1, 2, 3], [4, 5, 6]])
+    r = l.reshape((3, 2))
+    assert r == NList([[1, 2], [3, 4], [5, 6]])
+    r[0, 1] = 20
+    assert l[0, 1] == 20
+    assert l.reshape((-1,)) == NList([1, 20, 3, 4, 5, 6])
+    assert l.reshape((2, -1, 1)).shape == (2, 3, 1)
+    assert l[1, :].reshape((3, 1)) == NList([[4], [5], [6]])
+    assert NList(default=5).reshape((1, 1)) == NList([[5]])
+    assert NList(shape=(2, 0)).reshape((0, 7)).shape == (0, 7)
+
+    with pytest.raises(ValueError):
+        l.reshape((4, 2))
+    with pytest.raises(ValueError):
+        l.reshape((-1, -1))
+    with pytest.raises(ValueError):
+        l.reshape((4, -1))
+    with pytest.raises(ValueError):
+        l.T.reshape((6,))
+    assert l.T.contiguous().reshape((6,)) == NList([1, 4, 20, 5, 3, 6])
+
+def test_transpose():
+    l = NList([[1, 2, 3], [4, 5, 6]])
+    assert l.T == NList([[1, 4], [2, 5], [3, 6]])
+    assert l.transpose(0, 1) == l
+    assert l.T.T == l
+    l.T[2, 0] = 30
+    assert l[0, 2] == 30
+
+    l3 = NList(shape=(2, 3, 4))
+    for key in l3.keys():
+        l3[key] = key
+    t = l3.transpose(2, 0, 1)
+    assert t.shape == (4, 2, 3)
+    assert all(t[k, i, j] == (i, j, k) for k, i, j in t.keys())
+    assert l3.swapaxes(0, 2).shape == (4, 3, 2)
+    assert l3.swapaxes(0, 2)[3, 1, 0] == (0, 1, 3)
+    assert NList(default=1).T == NList(default=1)
+
+    with pytest.raises(ValueError):
+        l.transpose(0, 0)
+    with pytest.raises(ValueError):
+        l.transpose(0)
+
+def test_contiguous():
+    l = NList([[1, 2, 3], [4, 5, 6]])
+    assert l.contiguous() is l
+    assert l[1, :].contiguous()._data is l._data
+    c = l.T.contiguous()
+    assert c == l.T
+    c[0, 0] = 100
+    assert l[0, 0] == 1
+
+def test_chunked():
+    l = NList(shape=(5, 7), default=0, chunks=(2, 3))
+    assert l.chunks == (2, 3)
+    assert NList().chunks is None
+    assert l.count(0) == 35
+    assert l[4, 6] == 0
+    l[4, 6] = 1
+    l[0, 0] = 2
+    l[1, :] = 3
+    assert l[4, 6] == 1
+    assert l.count(0) == 26
+    assert l.count(3) == 7
+    assert 3 in l and 4 not in l
+    assert l.index(1) == (4, 6)
+    assert l.sum(axis=1) == NList([2, 21, 0, 0, 1])
+    assert len(l._data._chunks) == 4
+
+    dense = NList(l)
+    assert dense.chunks is None
+    assert dense == l
+    assert NList(dense, default=0, chunks=(2, 3)) == l
+
+    copied = l.copy()
+    assert copied.chunks == (2, 3)
+    copied[4, 6] = 5
+    assert l[4, 6] == 1
+
+    typed = NList(shape=(4, 4), dtype='d', chunks=(2, 2))
+    typed[3, 3] = 1.5
+    assert typed.sum() == 1.5
+    assert typed.dtype == 'd'
+    with pytest.raises(BufferError):
+        typed.as_memoryview()
+    assert type(typed[0, 0]) is float
+    assert NList(shape=(2,), dtype='i', default=3, chunks=(1,))[1,] == 3
+    with pytest.raises(TypeError):
+        NList(shape=(2, 2), dtype='i', default='x', chunks=(1, 1))
+
+    with pytest.raises(ValueError):
+        NList(shape=(4, 4), chunks=(2,))
+    with pytest.raises(ValueError):
+        NList(shape=(4, 4), chunks=(2, 0))
+    with pytest.raises(ValueError):
+        NList(shape=(4, 4), chunks=(2, 2), sparse=True)
+
+def test_iter_chunks():
+    l = NList(shape=(5, 7), default=0, chunks=(2, 3))
+    l[4, 6] = 1
+    tiles = list(l.iter_chunks())
+    assert [origin for origin, tile in tiles] == [
+        (0, 0), (0, 3), (0, 6), (2, 0), (2, 3), (2, 6), (4, 0), (4, 3), (4, 6)
+    ]
+    assert [tile.shape for origin, tile in tiles[-3:]] == [(1, 3), (1, 3), (1, 1)]
+    assert list(l.iter_chunks(allocated_only=True))[0][0] == (4, 6)
+
+    for origin, tile in l.iter_chunks():
+        tile[0, 0] = origin
+    assert l[2, 3] == (2, 3)
+
+    dense = NList([[1, 2, 3], [4, 5, 6]])
+    assert [tile for origin, tile in dense.iter_chunks((1, 2))] == [
+        NList([[1, 2]]), NList([[3]]), NList([[4, 5]]), NList([[6]])
+    ]
+    assert list(NList(default=1).iter_chunks(())) == [((), NList(default=1))]
+    with pytest.raises(ValueError):
+        dense.iter_chunks()
+    with pytest.raises(ValueError):
+        dense.iter_chunks((1, 2), allocated_only=True)
+
+def test_copy_on_write():
+    l = NList(shape=(4, 4), default=0, chunks=(2, 2))
+    l[0, 0] = 1
+    l[3, 3] = 2
+    copied = l.copy()
+    assert copied._data._chunks is l._data._chunks
+
+    copied[0, 1] = 3
+    assert l[0, 1] == 0
+    assert copied[0, 0] == 1 and copied[0, 1] == 3
+    # Only the tile written to is copied
+    assert copied._data._chunks[1, 1] is l._data._chunks[1, 1]
+    assert copied._data._chunks[0, 0] is not l._data._chunks[0, 0]
+
+    l[3, 3] = 4
+    assert copied[3, 3] == 2
+    l[2, 0] = 5
+    assert copied.count(0) == 13 and l.count(0) == 13
+
+    sparse = NList(shape=(3, 3), sparse=True)
+    sparse[1, 1] = 'x'
+    copied = sparse.copy()
+    copied[0, 0] = 'y'
+    sparse[1, 1] = None
+    assert list(copied.nonzero_items()) == [((0, 0), 'y'), ((1, 1), 'x')]
+    assert list(sparse.nonzero_items()) == []
+
+def test_snapshot():
+    l = NList(shape=(4, 4), default=0, chunks=(2, 2))
+    row = l[1, :]
+    history = []
+    for value in range(1, 4):
+        history.append(l.snapshot())
+        l[1, value] = value
+    assert row == NList([0, 1, 2, 3])
+
+    l.restore(history.pop())
+    assert row == NList([0, 1, 2, 0])
+    l.restore(history[0])
+    assert l == NList(shape=(4, 4), default=0)
+    l[0, 0] = 9
+    assert history[0][0, 0] == 0
+    assert history[1][1, 1] == 1
+
+    dense = NList([[1, 2], [3, 4]])
+    snapshot = dense.snapshot()
+    dense[0, 0] = 5
+    dense.restore(snapshot)
+    assert dense == NList([[1, 2], [3, 4]])
+    dense.restore(NList(l[:2, :2], chunks=(1, 1)))
+    assert dense == NList([[9, 0], [0, 0]])
+
+    zero = NList(default=1)
+    zero.restore(NList(default=2))
+    assert zero[()] == 2
+    with pytest.raises(ValueError):
+        dense.restore(NList(shape=(2, 3)))
+
+def test_frozen():
+    l = NList([[1, 2, 3], [4, 5, 6]], dtype='i')
+    frozen = l.freeze()
+    assert isinstance(frozen, FrozenNList)
+    assert type(frozen._data) is tuple
+    assert frozen.dtype is None
+    assert frozen == l and l == frozen
+    assert frozen.freeze() is frozen and frozen.copy() is frozen
+    assert repr(frozen) == 'FrozenNList([[1, 2, 3], [4, 5, 6]], shape=(2, 3))'
+
+    l[0, 0] = 7
+    assert frozen[0, 0] == 1
+    with pytest.raises(TypeError):
+        frozen[0, 0] = 7
+    with pytest.raises(TypeError):
+        frozen[0, :] = 7
+    with pytest.raises(TypeError):
+        frozen.set_unchecked((0, 0), 7)
+    with pytest.raises(TypeError):
+        frozen.put([(0, 0)], [7])
+
+    cache = {frozen: 'a', FrozenNList(shape=(2, 3), default=0): 'b'}
+    assert cache[FrozenNList([[1, 2, 3], [4, 5, 6]])] == 'a'
+    assert cache[FrozenNList(shape=(2, 3), default=0)] == 'b'
+    assert hash(frozen[:, 1]) == hash(FrozenNList([2, 5]))
+    assert hash(FrozenNList([1, 2])) != hash(FrozenNList([[1, 2]]))
+    assert FrozenNList([1, 2]) != FrozenNList([1, 3])
+
+    assert isinstance(frozen[1, :], FrozenNList)
+    assert isinstance(frozen + 1, FrozenNList)
+    assert frozen.T == FrozenNList([[1, 4], [2, 5], [3, 6]])
+    compact = frozen.T.contiguous()
+    assert isinstance(compact, FrozenNList) and compact.reshape((6,)) == FrozenNList([1, 4, 2, 5, 3, 6])
+    assert frozen.T.parallel_map(abs, processes=2) == frozen.T
+    assert pickle.loads(pickle.dumps(frozen)) == frozen
+
+    thawed = frozen.thaw()
+    assert type(thawed) is NList and type(thawed._data) is list
+    thawed[0, 0] = 7
+    assert frozen[0, 0] == 1
+    with pytest.raises(TypeError):
+        hash(l)
+
+def test_parallel_map():
+    l = NList([[1, -2, 3], [-4, 5, -6], [7, -8, 9]])
+    assert l.parallel_map(abs, processes=2) == l.map(abs)
+    assert l.parallel_map(abs, processes=2, chunksize=2) == l.map(abs)
+    assert l[:, ::-1].parallel_map(abs, processes=2, chunksize=1) == l[:, ::-1].map(abs)
+
+    typed = NList([[1.5, -2.0], [3.0, -4.5]], dtype='d')
+    result = typed.parallel_map(abs, processes=2, chunksize=1)
+    assert result == NList([[1.5, 2.0], [3.0, 4.5]])
+    assert result.dtype is None
+
+    assert NList(default=-3).parallel_map(abs) == NList(default=3)
+    assert NList(shape=(0, 3)).parallel_map(abs) == NList(shape=(0, 3))
+    with pytest.raises(ValueError):
+        l.parallel_map(abs, chunksize=0)
+
+def test_parallel_reduce():
+    l = NList([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+    assert l.parallel_reduce(operator.add, processes=2, chunksize=1) == 45
+    assert l.parallel_reduce(operator.add, initial=100, processes=2) == 145
+    typed = NList(shape=(100, 10), default=2, dtype='i')
+    assert typed.parallel_reduce(operator.mul, processes=3) == 2 ** 1000
+    assert NList(shape=(0,)).parallel_reduce(operator.add, initial=0) == 0
+    with pytest.raises(TypeError):
+        NList(shape=(0,)).parallel_reduce(operator.add)
+
+def test_map_threaded():
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def lookup(x):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.001)
+        with lock:
+            running[0] -= 1
+        return x * 10
+
+    l = NList([[1, 2, 3], [4, 5, 6]])
+    assert l.map_threaded(lookup, max_workers=3) == l * 10
+    assert running[1] <= 3
+    assert l[:, ::-1].map_threaded(lookup) == l[:, ::-1] * 10
+    assert NList(shape=(0, 2)).map_threaded(lookup) == NList(shape=(0, 2))
+
+    # A slow call does not hold back the calls queued after it
+    def uneven(x):
+        time.sleep(0.1 if x % 8 == 0 else 0.001)
+        return x
+    start = time.perf_counter()
+    NList(list(range(32))).map_threaded(uneven, max_workers=4)
+    assert time.perf_counter() - start < 0.3
+
+    calls = []
+    def failing(x):
+        calls.append(x)
+        if x == 3:
+            raise KeyError(x)
+        time.sleep(0.001)
+        return x
+
+    with pytest.raises(KeyError):
+        NList(list(range(1000))).map_threaded(failing, max_workers=2)
+    assert len(calls) < 100
+
+def test_amap():
+    running = [0, 0]
+
+    async def lookup(x):
+        running[0] += 1
+        running[1] = max(running)
+        await asyncio.sleep(0)
+        running[0] -= 1
+        return x * 10
+
+    def run(coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    l = NList([[1, 2, 3], [4, 5, 6]])
+    assert run(l.amap(lookup, concurrency=2)) == l * 10
+    assert running[1] == 2
+    assert run(NList(default=1).amap(lookup)) == NList(default=10)
+    assert run(NList(shape=(0,)).amap(lookup)) == NList(shape=(0,))
+
+    calls = []
+    async def failing(x):
+        calls.append(x)
+        if x == 3:
+            raise KeyError(x)
+        await asyncio.sleep(0)
+        return x
+
+    with pytest.raises(KeyError):
+        run(NList(list(range(1000))).amap(failing, concurrency=4))
+    assert len(calls) < 100
+    with pytest.raises(ValueError):
+        run(l.amap(lookup, concurrency=0))
+
+def test_lazy():
+    a = NList([[1, 2, 3], [4, 5, 6]])
+    b = NList([10, 20, 30])
+    c = NList([[15], [40]])
+    expression = (a.lazy() * 2 + b) > c
+    assert isinstance(expression, LazyNList)
+    assert expression.shape == (2, 3)
+    assert expression.compute() == ((a * 2 + b) > c)
+    assert (1 - a.lazy()).compute() == 1 - a
+    assert abs(-a.lazy()).compute() == a
+    assert a.lazy().map(max, 3, b.lazy()).compute() == a.map(max, 3, b)
+    assert a.lazy().lazy().compute() == a
+    assert NList(default=2).lazy().map(operator.mul, b).compute() == b * 2
+
+    # An NList on the left of a LazyNList gives a LazyNList too
+    assert isinstance(a + a.lazy(), LazyNList)
+    assert (a + a.lazy()).compute() == a * 2
+    assert (c < a.lazy() * 10).compute() == (c < a * 10)
+    assert (b - a.lazy()).compute() == b - a
+    assert a.map(operator.mul, b.lazy()).compute() == a * b
+
+    calls = []
+    def tracked(x):
+        calls.append(x)
+        return x * 10
+    expression = a.lazy().map(tracked) + b
+    assert calls == []
+    assert expression[1, 2] == 90
+    assert calls == [6]
+    region = expression[:, 1:]
+    assert region.shape == (2, 2)
+    assert region.compute() == NList([[40, 60], [70, 90]])
+    assert calls == [6, 2, 3, 5, 6]
+    assert expression[::-1, 0].compute() == NList([50, 20])
+
+    with pytest.raises(IndexError):
+        expression[2, 0]
+    with pytest.raises(ValueError):
+        a.lazy() + NList([1, 2])
+
+def test_lazy_reduce():
+    a = NList([[1, 2, 3], [4, 5, 6]])
+    expression = a.lazy() * 2
+    assert expression.sum() == 42
+    assert expression.reduce(operator.mul, initial=1) == 46080
+    assert expression.max() == 12
+    assert (expression > 4).any() and not (expression > 4).all()
+    assert expression.sum(axis=0).compute() == NList([10, 14, 18])
+    assert expression.sum(axis=1).compute() == NList([12, 30])
+    assert expression.min(axis=1).compute() == NList([2, 8])
+    assert (expression.sum(axis=0) + 1).compute() == NList([11, 15, 19])
+    assert expression.sum(axis=0)[1,] == 14
+    assert NList(shape=(2, 0)).lazy().sum(axis=1).compute() == NList([0, 0])
+
+    l3 = NList([
+        [[1, 2, 3], [4, 5, 6]],
+        [[7, 8, 9], [10, 11, 12]]
+    ])
+    for axis in range(3):
+        assert l3.lazy().sum(axis=axis).compute() == l3.sum(axis=axis)
+    with pytest.raises(ValueError):
+        expression.sum(axis=2)
+
+def test_profile():
+    getitem = NList.__getitem__
+    l = NList(shape=(8, 8), default=0)
+    with NList.profile(heatmap=2):
+        assert NList.__getitem__ is not getitem
+        for i in range(4):
+            l[i, i] = l[i, 7]
+        l[7, 0]
+        l[2:4, :]
+        list(l.keys())
+        l.index(0)
+        l.to_nested()
+        with pytest.raises(RuntimeError):
+            with NList.profile():
+                pass
+        with pytest.raises(IndexError):
+            l[8, 8]
+    assert NList.__getitem__ is getitem
+
+    stats = NList.stats()
+    assert stats['__getitem__']['calls'] == 7
+    assert stats['__setitem__']['calls'] == 4
+    assert stats['keys']['calls'] == 1
+    assert stats['index']['calls'] == 1
+    assert stats['to_nested']['calls'] == 1
+    assert stats['__getitem__']['time'] > 0
+    assert l.access_heatmap() == NList([[4, 4], [1, 0]])
+    assert NList().access_heatmap() is None
+
+    with NList.profile():
+        l[0, 0]
+    assert NList.stats()['__getitem__']['calls'] == 1
+    assert NList.stats()['keys']['calls'] == 0
+
+    # Iterating over the keys counts towards the time of keys()
+    with NList.profile():
+        keys = NList(shape=(300, 300)).keys()
+        created = NList.stats()['keys']['time']
+        assert sum(1 for _ in keys) == 90000
+        assert NList.stats()['keys']['time'] > created
+    assert NList.stats()['keys']['calls'] == 1
+    assert l.access_heatmap() is None
+
+    with NList.profile(heatmap=4):
+        l[7, 7]
+    assert l.access_heatmap().shape == (4, 4)
+    assert l.access_heatmap().sum() == 1
+
+def test_init_from_nested_strings():
+    assert NList(['ab', 'cd']).shape == (2,)
+    assert NList([['a', 'b'], ['c', 'd']]).shape == (2, 2)
+    assert NList([['a', 'b'], ['c', 'd']])[1, 0] == 'c'
+    assert NList([[b'xy'], [b'z']]).shape == (2, 1)
+    assert NList([[1, 2], (3, 4)]).shape == (2, 2)
+    assert NList([[[1, 2], [3, 4]], [[5, 6], 7]]).shape == (2, 2)
+
+    values = [1, 2, 3]
+    l = NList(values)
+    l[0,] = 42
+    assert values == [1, 2, 3]
+
+def test_from_flat():
+    values = [1, 2, 3, 4, 5, 6]
+    l = NList.from_flat(values, (2, 3))
+    assert l == NList([[1, 2, 3], [4, 5, 6]])
+    l[0, 0] = 42
+    assert values[0] == 42
+    l = NList.from_flat(values, (3, 2), copy=True)
+    l[0, 0] = 1
+    assert values[0] == 42
+
+    data = array.array('i', range(4))
+    l = NList.from_flat(data, (2, 2))
+    assert l.dtype == 'i'
+    data[3] = 7
+    assert l[1, 1] == 7
+    assert NList.from_flat(data, (4,), copy=True)._data is not data
+    assert NList.from_flat((1, 2), (2,)) == NList([1, 2])
+    assert NList.from_flat([5], ()) == NList(default=5)
+
+    with pytest.raises(ValueError):
+        NList.from_flat(values, (2, 2))
+    with pytest.raises(ValueError):
+        NList.from_flat(values, (2, -3))
+
+def test_from_iter():
+    assert NList.from_iter(range(6), (2, 3)) == NList([[0, 1, 2], [3, 4, 5]])
+    l = NList.from_iter((x / 2 for x in range(4)), (2, 2), dtype='d')
+    assert l.dtype == 'd'
+    assert l == NList([[0.0, 0.5], [1.0, 1.5]])
+    assert NList.from_iter(iter([]), (0, 5)).shape == (0, 5)
+    with pytest.raises(ValueError):
+        NList.from_iter(range(5), (2, 3))
+    with pytest.raises(ValueError):
+        NList.from_iter(range(7), (2, 3))
+
+def test_fromfunction():
+    assert NList.fromfunction(lambda i, j: i * 10 + j, (2, 3)) == NList([
+        [0, 1, 2], [10, 11, 12]
+    ])
+    l = NList.fromfunction(lambda i: i / 2, (3,), dtype='f')
+    assert l.dtype == 'f'
+    assert l == NList([0.0, 0.5, 1.0])
+    assert NList.fromfunction(lambda: 'x', ()) == NList(default='x')
+    assert NList.fromfunction(lambda i, j: 1, (3, 0)).shape == (3, 0)
+
+def test_append():
+    l = NList(shape=(0, 3))
+    for k in range(4):
+        l.append([k, k + 1, k + 2])
+    assert l == NList([[0, 1, 2], [1, 2, 3], [2, 3, 4], [3, 4, 5]])
+    assert l._data == [0, 1, 2, 1, 2, 3, 2, 3, 4, 3, 4, 5]
+
+    l.append(NList([10, 20, 30, 40]), axis=1)
+    l.append([50, 60, 70, 80], axis=1)
+    assert l[:, 3] == NList([10, 20, 30, 40])
+    assert l[:, 4] == NList([50, 60, 70, 80])
+    assert l.shape == (4, 5)
+    assert len(l._data) > l.size
+    l.append([0] * 5)
+    assert l[4, :] == NList([0] * 5)
+    assert l.sum() == 30 + 100 + 260
+
+    row = NList([[1, 2], [3, 4]])[1, :]
+    column = NList([1, 2, 3])
+    column.append(row)
+    assert column[3,] == row
+
+    typed = NList([1.5], dtype='d')
+    typed.append(2)
+    assert typed == NList([1.5, 2.0]) and typed.dtype == 'd'
+    with pytest.raises(TypeError):
+        typed.append('x')
+    assert typed.shape == (2,)
+    grid = NList([[1.0], [2.0]], dtype='d')
+    with pytest.raises(TypeError):
+        grid.append(['x', 'y'], axis=1)
+    assert grid == NList([[1.0], [2.0]])
+
+    with pytest.raises(ValueError):
+        l.append([1, 2])
+    with pytest.raises(ValueError):
+        l.append([1, 2], axis=2)
+    with pytest.raises(ValueError):
+        NList().append(1)
+    with pytest.raises(ValueError):
+        NList([[1, 2], [3, 4]])[:, 0].append(5)
+    parent = NList([[1, 2, 3], [4, 5, 6]])
+    full = parent[:, :]
+    with pytest.raises(ValueError):
+        full.append([7, 8, 9])
+    with pytest.raises(ValueError):
+        parent.reshape((3, 2)).append([7, 8])
+    parent.append([7, 8, 9])
+    assert parent[2, :] == NList([7, 8, 9])
+    assert full == NList([[1, 2, 3], [4, 5, 6]])
+    with pytest.raises(TypeError):
+        NList(shape=(2,), sparse=True).append(5)
+    with pytest.raises(TypeError):
+        FrozenNList([1]).append(2)
+
+def test_extend():
+    l = NList([[1, 2], [3, 4]])
+    l.extend([[5, 6], [7, 8]])
+    l.extend(NList([[0], [0], [0], [0]]), axis=1)
+    assert l == NList([[1, 2, 0], [3, 4, 0], [5, 6, 0], [7, 8, 0]])
+    l.extend(NList([[9, 9, 9]]).T[::-1, :].T)
+    assert l[4, :] == NList([9, 9, 9])
+
+    indexed = NList([1, 2]).with_value_index()
+    indexed.extend([2, 3])
+    assert indexed.find_all(2) == [(1,), (2,)]
+    with pytest.raises(ValueError):
+        l.extend([[1, 2]])
+
+def test_resize():
+    l = NList([[1, 2], [3, 4]])
+    l.resize((3, 3))
+    assert l == NList([[1, 2, None], [3, 4, None], [None, None, None]])
+    l.resize((1, 2))
+    assert l == NList([[1, 2]])
+    l.resize((2, 3), fill=0)
+    assert l == NList([[1, 2, 0], [0, 0, 0]])
+
+    typed = NList([1, 2], dtype='i')
+    typed.resize((4,))
+    assert typed == NList([1, 2, 0, 0])
+    typed.resize((1,))
+    assert typed._data == array.array('i', [1])
+
+    with pytest.raises(ValueError):
+        l.resize((2,))
+    with pytest.raises(ValueError):
+        l.resize((2, -1))
+
+def test_neighbourhoods():
+    l = NList([[1, 2, 3], [4, 5, 6]])
+    assert [index for index, _ in l.neighbourhoods()] == list(l.keys())
+    cells = dict(l.neighbourhoods())
+    assert cells[0, 0] == [1, 1, 2, 1, 1, 2, 4, 4, 5]
+    assert cells[1, 1] == [1, 2, 3, 4, 5, 6, 4, 5, 6]
+
+    wrapped = dict(l.neighbourhoods(boundary='wrap'))
+    assert wrapped[0, 0] == [6, 4, 5, 3, 1, 2, 6, 4, 5]
+    constant = dict(l.neighbourhoods([(0, -1), (0, 1)], 'constant', 0))
+    assert constant[0, 0] == [0, 2]
+    assert constant[1, 1] == [4, 6]
+
+    # A view reads the neighbours through its own layout
+    view = NList([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]])[::2, ::-1]
+    assert dict(view.neighbourhoods([(1, 0), (0, 1)]))[0, 1] == [11, 2]
+    assert list(NList([1, 2, 3]).neighbourhoods(0)) == [((0,), [1]), ((1,), [2]), ((2,), [3])]
+    assert list(NList(default=4).neighbourhoods([(), ()])) == [((), [4, 4])]
+    assert list(NList(shape=(0, 3)).neighbourhoods()) == []
+
+    with pytest.raises(ValueError):
+        l.neighbourhoods(-1)
+    with pytest.raises(ValueError):
+        l.neighbourhoods([(1,)])
+    with pytest.raises(ValueError):
+        l.neighbourhoods(boundary='reflect')
+
+def test_convolve():
+    l = NList([[1, 2, 3], [4, 5, 6]])
+    cross = [[0, 1, 0], [1, 1, 1], [0, 1, 0]]
+    assert l.convolve(cross) == NList([[7, 11, 11], [10, 17, 14]])
+    assert l.convolve(cross, boundary='wrap').sum() == 5 * l.sum()
+    assert l.convolve([[1]]) == l
+
+    line = NList([1, 2, 3, 4])
+    assert line.convolve([1, 0, 0]) == NList([2, 3, 4, 0])
+    assert line.convolve([0, 0, 1]) == NList([0, 1, 2, 3])
+    assert line.convolve(NList([1, 1]), boundary='clip') == NList([3, 5, 7, 8])
+
+    grid = NList(shape=(20, 30), default=1)
+    blurred = grid.convolve(NList(shape=(3, 3), default=1))
+    assert blurred[0, 0] == 4 and blurred[0, 5] == 6 and blurred[10, 10] == 9
+
+    with pytest.raises(ValueError):
+        l.convolve([1, 1])